@@ -0,0 +1,228 @@
+import hashlib
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context, url_for
+
+from exporter import FORMATS, export
+from models import db, Venue, VenueGenre, Artist, ArtistGenre, Show
+from sqlstats import query_budget
+from timeutil import as_utc
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+#----------------------------------------------------------------------------#
+# Resources.
+#----------------------------------------------------------------------------#
+
+# Field name -> column for each resource. Only the fields asked for with
+# `?fields=` are selected; `genres` is loaded with one extra query per page.
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'city': Venue.city,
+    'state': Venue.state,
+    'address': Venue.address,
+    'phone': Venue.phone,
+    'image_link': Venue.image_link,
+    'facebook_link': Venue.facebook_link,
+    'website_link': Venue.website_link,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+}
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'image_link': Artist.image_link,
+    'facebook_link': Artist.facebook_link,
+    'website_link': Artist.website_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+}
+SHOW_FIELDS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'end_time': Show.end_time,
+    'venue_id': Show.venue_id,
+    'artist_id': Show.artist_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+RESOURCES = {
+    'venues': (Venue, VENUE_FIELDS, VenueGenre, VenueGenre.venue_id),
+    'artists': (Artist, ARTIST_FIELDS, ArtistGenre, ArtistGenre.artist_id),
+    'shows': (Show, SHOW_FIELDS, None, None),
+}
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=lambda value: value.isoformat(), separators=(',', ':')).encode('utf-8')
+
+
+def json_response(data, status=200):
+    # Strong ETag over the body; a matching If-None-Match gets a bodiless 304.
+    body = dumps(data)
+    response = Response(body, status=status, mimetype='application/json')
+    if status == 200:
+        response.set_etag(hashlib.sha1(body).hexdigest())
+        response.make_conditional(request)
+    return response
+
+
+def requested_fields(resource):
+    model, fields, genre_model, genre_key = RESOURCES[resource]
+    available = list(fields) + (['genres'] if genre_model is not None else [])
+    names = [name for name in request.args.get('fields', '').split(',') if name]
+    if not names:
+        return available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, 'Unknown field(s): ' + ', '.join(unknown))
+    return names
+
+
+def select(resource, names):
+    # Query over just the requested columns (always including the id, which
+    # is the pagination key), joining venues/artists only when a show field
+    # from them was asked for.
+    model, fields, genre_model, genre_key = RESOURCES[resource]
+    columns = [model.id] + [fields[name] for name in names if name not in ('id', 'genres')]
+    query = db.session.query(*columns)
+    if resource == 'shows':
+        if any(name.startswith('venue_') and name != 'venue_id' for name in names):
+            query = query.join(Venue, Show.venue_id == Venue.id)
+        if any(name.startswith('artist_') and name != 'artist_id' for name in names):
+            query = query.join(Artist, Show.artist_id == Artist.id)
+    return query
+
+
+def serialize(resource, names, rows):
+    model, fields, genre_model, genre_key = RESOURCES[resource]
+    column_names = [name for name in names if name not in ('id', 'genres')]
+    items = []
+    for row in rows:
+        item = {'id': row[0]} if 'id' in names else {}
+        item.update((name, as_utc(value) if isinstance(value, datetime) else value)
+                    for name, value in zip(column_names, row[1:]))
+        items.append((row[0], item))
+    if 'genres' in names:
+        genres = {}
+        ids = [entity_id for entity_id, item in items]
+        for entity_id, genre in db.session.query(genre_key, genre_model.genre).filter(genre_key.in_(ids)):
+            genres.setdefault(entity_id, []).append(genre)
+        for entity_id, item in items:
+            item['genres'] = genres.get(entity_id, [])
+    return [item for entity_id, item in items]
+
+
+def list_resource(resource):
+    # Keyset pagination on id: `?after=<id>&limit=<n>`.
+    model = RESOURCES[resource][0]
+    names = requested_fields(resource)
+    after = request.args.get('after', type=int)
+    limit = min(request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int),
+                current_app.config['API_MAX_PAGE_SIZE'])
+    if limit < 1:
+        abort(400, 'limit must be positive')
+
+    query = select(resource, names)
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(limit + 1).all()
+
+    next_page = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        args = dict(request.args, after=rows[-1][0])
+        next_page = url_for(request.endpoint, **args)
+    return json_response({'data': serialize(resource, names, rows), 'next': next_page})
+
+
+def get_resource(resource, entity_id):
+    model = RESOURCES[resource][0]
+    names = requested_fields(resource)
+    rows = select(resource, names).filter(model.id == entity_id).all()
+    if not rows:
+        abort(404)
+    return json_response({'data': serialize(resource, names, rows)[0]})
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+@query_budget(2)
+def venues():
+    return list_resource('venues')
+
+
+@api.route('/venues/<int:venue_id>')
+@query_budget(2)
+def venue(venue_id):
+    return get_resource('venues', venue_id)
+
+
+@api.route('/artists')
+@query_budget(2)
+def artists():
+    return list_resource('artists')
+
+
+@api.route('/artists/<int:artist_id>')
+@query_budget(2)
+def artist(artist_id):
+    return get_resource('artists', artist_id)
+
+
+@api.route('/shows')
+@query_budget(1)
+def shows():
+    return list_resource('shows')
+
+
+@api.route('/shows/<int:show_id>')
+@query_budget(1)
+def show(show_id):
+    return get_resource('shows', show_id)
+
+
+@api.route('/export/<any(venues, artists, shows):resource>')
+def export_resource(resource):
+    # Whole-table dump streamed from a server-side cursor:
+    # `?format=ndjson|csv&after=<id>`, gzipped when the client accepts it.
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        abort(400, 'format must be one of: ' + ', '.join(FORMATS))
+    after = request.args.get('after', type=int)
+    compress = 'gzip' in request.accept_encodings
+    chunks = export(resource, fmt, after=after, batch_size=current_app.config['EXPORT_BATCH_SIZE'], compress=compress)
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (resource, fmt)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def api_error(error):
+    return Response(dumps({'error': error.description}), status=error.code, mimetype='application/json')
+
+# Registered per code so they take precedence over the app's HTML 404/500 pages.
+for code in (400, 404, 405, 500):
+    api.register_error_handler(code, api_error)
@@ -3,109 +3,249 @@
 #----------------------------------------------------------------------------#
 
 import json
+import os
+import string
+import dateutil_compat
 import dateutil.parser
 import babel
-import sys
+import babel.dates
+import functools
+import hashlib
+import click
 from datetime import datetime
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, stream_with_context, jsonify, abort, session, make_response, g
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import func, or_, select, tuple_, union
 from flask_migrate import Migrate
-import logging
-from logging import Formatter, FileHandler
+from werkzeug.http import is_resource_modified
 from flask_wtf import Form
 from forms import *
+from enumvalidation import Genre
+from models import db, Venue, VenueGenre, VenueStats, Artist, ArtistGenre, ArtistStats, Show, TableVersion, DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
+from suggest import PrefixIndex
+from cache import create_cache
+from api import api
+from importer import import_file
+from timeutil import utcnow, as_utc
+from stats import refresh_stats, roll_stats, rebuild_stats
+from conflicts import overlapping_shows, find_conflicts
+import dbpool
+import logsetup
+import profiles
+import metrics as appmetrics
+import replicas
+import templating
+from logsetup import log_payload
+import sqlstats
+from sqlstats import query_budget
+from exporter import FORMATS as EXPORT_FORMATS, export
+from metrics import metrics, collector
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
 app = Flask(__name__)
+# Before anything that reads the settings or creates the Jinja environment.
+profiles.load(app)
 moment = Moment(app)
-app.config.from_object('config')
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db = SQLAlchemy(app)
+db.init_app(app)
 
 # TODO: connect to a local postgresql database
 migrate = Migrate(app, db)
-
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-
-class Venue(db.Model):
-    __tablename__ = 'venues'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website_link = db.Column(db.String(120))
-    seeking_talent = db.Column(db.String(120))
-    seeking_description = db.Column(db.String(120))
-    show = db.relationship('Show', backref='venues', lazy=True)
-
-    def __repr__(self):
-        return f'<Venue ID: {self.id}, Name: {self.name}>'
-
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-class Artist(db.Model):
-    __tablename__ = 'artists'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website_link = db.Column(db.String(120))
-    seeking_venue = db.Column(db.String(120))
-    seeking_description = db.Column(db.String(120))
-    show = db.relationship('Show', backref='artists', lazy=True)
-
-    def __repr__(self):
-        return f'<Artist ID: {self.id}, Name: {self.name}>'
-
-    # TODO: implement any missing fields, as a database migration using Flask-Migrate
-
-class Show(db.Model):
-    __tablename__ = 'shows'
-
-    id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.DateTime, default=datetime.now(), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
-    venue = db.relationship('Venue', backref=db.backref('shows', cascade='all, delete'))
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
-    artist = db.relationship('Artist', backref=db.backref('shows', cascade='all, delete'))
-
-    def __repr__(self):
-        return f'<Show ID: {self.id}, Time: {self.start_time} , Venue ID: {self.venue_id}, Artist ID: {self.artist_id}>'
-
-# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+page_cache = create_cache(app.config)
+logsetup.init_app(app)
+sqlstats.init_app(app)
+replicas.init_app(app)
+appmetrics.init_app(app)
+app.register_blueprint(api)
+app.register_blueprint(metrics)
+collector(lambda: dbpool.pool_metrics(db.engine))
+collector(page_cache.metrics)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+  # Parsed Babel pattern and locale, compiled once per (format, locale).
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
+  # Accepts datetime objects directly; strings are still parsed for callers
+  # that pass preformatted times. Times are shown in UTC, naive ones being
+  # taken as UTC already.
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  value = as_utc(value)
   if format == 'full':
       format="EEEE MMMM, d, y 'at' h:mma"
   elif format == 'medium':
       format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+  elif format in ('long', 'short'):
+      return babel.dates.format_datetime(value, format, locale='en')
+  pattern, locale = datetime_pattern(format, 'en')
+  return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
+# After the filters, which templates need in order to compile.
+templating.init_app(app)
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def upcoming_show_counts(key, counts, ids):
+  # Number of upcoming shows per id, read from the venue_stats / artist_stats
+  # rows (`key`/`counts` are e.g. VenueStats.venue_id and
+  # VenueStats.upcoming_shows_count); ids without a row are absent.
+  if not ids:
+    return {}
+  return dict(db.session.query(key, counts).filter(key.in_(ids)))
+
+def search(model, genre_key, search_term):
+  # Partial, case-insensitive match on name or city, plus exact state codes and
+  # any genre whose name or label contains the term (`genre_key` is e.g.
+  # VenueGenre.venue_id), at most SEARCH_LIMIT results. Each kind of match is
+  # its own SELECT of ids and the ids are UNIONed, so each one can use its
+  # index (pg_trgm GIN on name/city, state, genre); OR-ed in one WHERE they
+  # force a scan of the whole table. On Postgres the `%` operator adds
+  # typo-tolerant matches and results are ranked by similarity; elsewhere they
+  # are ordered by name.
+  term = search_term.strip()
+  pattern = '%' + term + '%'
+  postgres = term and db.engine.dialect.name == 'postgresql'
+  text_match = or_(model.name.ilike(pattern), model.city.ilike(pattern))
+  if postgres:
+    text_match = or_(text_match, model.name.op('%')(term))
+  matches = [select(model.id).where(text_match)]
+  if term:
+    matches.append(select(model.id).where(model.state == term.upper()))
+    genres = [genre.name for genre in Genre if term.lower() in genre.name.lower() or term.lower() in genre.value.lower()]
+    if genres:
+      matches.append(select(genre_key).where(genre_key.class_.genre.in_(genres)))
+
+  query = db.session.query(model.id, model.name).filter(model.id.in_(union(*matches)))
+  if postgres:
+    similarity = func.greatest(func.similarity(model.name, term), func.similarity(model.city, term))
+    query = query.order_by(similarity.desc(), model.name, model.id)
+  else:
+    query = query.order_by(model.name, model.id)
+  return query.limit(app.config['SEARCH_LIMIT']).all()
+
+def partition_shows(shows):
+  # Split (start_time, show) pairs into past and upcoming show lists in one
+  # pass; a show starting exactly now counts as upcoming.
+  now = utcnow()
+  past_show=[]
+  upcoming_show=[]
+  for start_time, show in shows:
+    if as_utc(start_time) < now:
+      past_show.append(show)
+    else:
+      upcoming_show.append(show)
+  return past_show, upcoming_show
+
+def invalidate_pages(venue_ids=(), artist_ids=()):
+  page_cache.invalidate(*['venue:%d' % int(venue_id) for venue_id in venue_ids],
+                        *['artist:%d' % int(artist_id) for artist_id in artist_ids])
+
+def show_counterparts(column, other_column, entity_id):
+  # Ids on the other side of `entity_id`'s shows, e.g. the artists that
+  # played a venue; their pages embed this entity's name and image.
+  return [other_id for other_id, in db.session.query(other_column).filter(column == entity_id).distinct()]
+
+def conditional(validators):
+  # Conditional GET for a view: `validators(**view_args)` returns the values the
+  # page depends on (from one cheap query), or None
+  # to just run the view. A matching If-None-Match / If-Modified-Since is
+  # answered with 304 before the view's own queries run. Skipped while flash
+  # messages are pending, since the layout renders them. The ETag is left in
+  # g.etag for the view's page_cache lookup.
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(**view_args):
+      values = None if '_flashes' in session else validators(**view_args)
+      if values is None:
+        return view(**view_args)
+      etag = g.etag = hashlib.sha1(repr(values).encode('utf-8')).hexdigest()
+      # Naive UTC, which is what Werkzeug compares If-Modified-Since against.
+      last_modified = max((as_utc(value) for value in values if isinstance(value, datetime)), default=None)
+      if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=None)
+      if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(view(**view_args))
+      else:
+        response = Response(status=304)
+      response.set_etag(etag, weak=True)
+      response.last_modified = last_modified
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
+
+def detail_validators(entity, counterpart, key, counterpart_key, entity_id):
+  # What a venue/artist page depends on: its own row, its shows, the
+  # counterparts' rows, and the latest show that has already started (when
+  # it started, the page moved it from upcoming to past). The show counts
+  # catch a deleted show in the ETag; the last show delete anywhere moves
+  # Last-Modified for it.
+  now = utcnow()
+  return db.session.query(
+      func.max(Show.start_time).filter(Show.start_time < now),
+      entity.updated_at,
+      func.max(Show.updated_at),
+      func.max(counterpart.updated_at),
+      func.count(Show.id),
+      func.count(Show.id).filter(Show.start_time < now),
+      db.session.query(TableVersion.deleted_at).filter(TableVersion.name == Show.__tablename__).scalar_subquery()) \
+    .select_from(entity) \
+    .outerjoin(Show, key == entity.id) \
+    .outerjoin(counterpart, counterpart.id == counterpart_key) \
+    .filter(entity.id == entity_id) \
+    .group_by(entity.id) \
+    .first()
+
+def venue_validators(venue_id):
+  return detail_validators(Venue, Artist, Show.venue_id, Show.artist_id, venue_id)
+
+def artist_validators(artist_id):
+  return detail_validators(Artist, Venue, Show.artist_id, Show.venue_id, artist_id)
+
+def listing_validators(*models):
+  # Latest change, delete count and last delete (see TableVersion) of each
+  # table a listing reads, plus the latest show that has already started, as
+  # scalar subqueries of one SELECT; each is an index lookup, where counting
+  # rows would read the whole table.
+  now = utcnow()
+  columns = [db.session.query(func.max(Show.start_time)).filter(Show.start_time < now).scalar_subquery()]
+  for model in models:
+    version = db.session.query(TableVersion).filter(TableVersion.name == model.__tablename__)
+    columns.append(db.session.query(func.max(model.updated_at)).scalar_subquery())
+    columns.append(version.with_entities(TableVersion.deletes).scalar_subquery())
+    columns.append(version.with_entities(TableVersion.deleted_at).scalar_subquery())
+  return tuple(db.session.query(*columns).one())
+
+# Autocomplete indexes, loaded lazily and refreshed every SUGGEST_REBUILD_SECONDS
+# (to pick up writes made by other workers); this worker's own writes are
+# applied incrementally by the create/edit/delete handlers.
+suggest_indexes = {'venue': PrefixIndex(), 'artist': PrefixIndex()}
+
+def suggest_index(kind):
+  index = suggest_indexes[kind]
+  if index.is_stale(app.config['SUGGEST_REBUILD_SECONDS']):
+    model = Venue if kind == 'venue' else Artist
+    index.rebuild(db.session.query(model.id, model.name))
+  return index
+
+def stream_template(template_name, **context):
+  # Render a template as a generator, so the response starts going out
+  # before the whole page (and any lazy query in `context`) has been built.
+  # Timed for /metrics here, since Flask's render signals are not sent.
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  return Response(stream_with_context(appmetrics.timed_render(template_name, template.generate(context))))
 
 #----------------------------------------------------------------------------#
 # Controllers.
@@ -116,32 +256,50 @@ def index():
   return render_template('pages/home.html')
 
 
+@app.route('/api/suggest')
+@query_budget(1)
+def suggest():
+  # Name suggestions for the navbar search boxes, answered from memory.
+  kind = request.args.get('type', 'venue')
+  if kind not in suggest_indexes:
+    abort(404)
+  matches = suggest_index(kind).suggest(request.args.get('q', ''), limit=app.config['SUGGEST_LIMIT'])
+  endpoint = 'show_venue' if kind == 'venue' else 'show_artist'
+  return jsonify(suggestions=[
+    {'id': entity_id, 'name': name, 'url': url_for(endpoint, **{kind + '_id': entity_id})}
+    for entity_id, name in matches
+  ])
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@query_budget(2)
+@conditional(lambda: listing_validators(Venue, VenueStats))
 def venues():
   # TODO: replace with real venues data.
   #       num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-  getallstate = Venue.query.distinct(Venue.state, Venue.city).all()
-  
+  # One query for the whole directory: every venue with its number of
+  # upcoming shows from venue_stats, ordered so that venues of the same city
+  # are adjacent.
+  venuelist = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, func.coalesce(VenueStats.upcoming_shows_count, 0)) \
+    .outerjoin(VenueStats, VenueStats.venue_id == Venue.id) \
+    .order_by(Venue.state, Venue.city, Venue.id) \
+    .all()
+
   data=[]
-  for uniquestate in getallstate:
-    states = Venue.query.filter_by(state=uniquestate.state, city=uniquestate.city).all()
+  for venue_id, name, city, state, upcoming_count in venuelist:
+    if not data or data[-1]['city'] != city or data[-1]['state'] != state:
+      data.append({
+       'city': city,
+       'state': state,
+       'venues': []
+      })
+    data[-1]['venues'].append({'id': venue_id,
+                               'name': name,
+                               'numof_upcm_shows': upcoming_count})
 
-    state_data=[]
-    for venue in states:
-      venue_data = {'id': venue.id,
-                    'name': venue.name,
-                    'numof_upcm_shows' : Show.query.filter_by(venue_id=venue.id).filter(Show.start_time > datetime.now()).count()}
-      state_data.append(venue_data)
-
-    data.append({
-     'city': venue.city,
-     'state': venue.state,
-     'venues': state_data
-    })
-   
   return render_template('pages/venues.html', areas=data);
 
   #data=[{
@@ -169,19 +327,22 @@ def venues():
   
 
 @app.route('/venues/search', methods=['POST'])
+@query_budget(2)
 def search_venues():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   search_term = request.form.get('search_term', ' ')
-  venuesearch = Venue.query.filter(Venue.name.ilike("%" + search_term + "%")).all()
+  venuesearch = search(Venue, VenueGenre.venue_id, search_term)
   
+  upcoming = upcoming_show_counts(VenueStats.venue_id, VenueStats.upcoming_shows_count, [venue.id for venue in venuesearch])
+
   data=[]
   counter=0
   for venue in venuesearch:
       venue_data = {'id': venue.id,
                     'name': venue.name,
-                    'numof_upcm_shows' : Show.query.filter_by(venue_id=venue.id).filter(Show.start_time > datetime.now()).count()}
+                    'numof_upcm_shows' : upcoming.get(venue.id, 0)}
       counter+=1
       data.append(venue_data)
 
@@ -201,34 +362,25 @@ def search_venues():
   #}
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data={}
+def venue_payload(venue_id):
+  # Everything the venue page shows, with each show's start time kept
+  # alongside it so the past/upcoming split can be redone on every hit.
   venueshow = Venue.query.get(venue_id)
-  
-  pastshows = Show.query.join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time < datetime.now()).all()
-  past_show=[]
-  for show in pastshows:
-    past_show.append({'artist_id': show.artist_id,
-                      'artist_name': show.artist.name,
-                      'artist_image_link': show.artist.image_link,
-                      'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')}
-                    )
-
-  upcomingshows = Show.query.join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time > datetime.now()).all()
-  upcoming_show=[]
-  for show in upcomingshows:
-    upcoming_show.append({'artist_id': show.artist_id,
-                          'artist_name': show.artist.name,
-                          'artist_image_link': show.artist.image_link,
-                          'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')}
-                        )
-   
+  if venueshow is None:
+    return None
+
+  # One query for all of the venue's shows, selecting only the artist columns
+  # the page needs.
+  venueshows = db.session.query(Show.artist_id, Artist.name, Artist.image_link, Show.start_time) \
+    .join(Artist, Show.artist_id == Artist.id) \
+    .filter(Show.venue_id == venue_id) \
+    .order_by(Show.start_time) \
+    .all()
+
+  data={}
   data['id']= venueshow.id
   data['name']= venueshow.name
-  data['genres']= venueshow.genres.strip('{}').split(',')
+  data['genres']= list(venueshow.genres)
   data['address']= venueshow.address
   data['city']= venueshow.city
   data['state']= venueshow.state
@@ -238,6 +390,27 @@ def show_venue(venue_id):
   data['seeking_talent']= venueshow.seeking_talent
   data['seeking_description']= venueshow.seeking_description
   data['image_link']= venueshow.image_link
+  data['shows']= [(start_time, {'artist_id': artist_id,
+                                'artist_name': artist_name,
+                                'artist_image_link': artist_image_link,
+                                'start_time': start_time})
+                  for artist_id, artist_name, artist_image_link, start_time in venueshows]
+  return data
+
+@app.route('/venues/<int:venue_id>')
+@query_budget(4)
+@conditional(venue_validators)
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  # TODO: replace with real venue data from the venues table, using venue_id
+  payload = page_cache.get_or_set('venue:%d' % venue_id, lambda: venue_payload(venue_id), g.get('etag'))
+  if payload is None:
+    abort(404)
+
+  # Partition against a single timestamp, on every hit, so cached pages
+  # still move shows from upcoming to past as time passes.
+  data = {key: value for key, value in payload.items() if key != 'shows'}
+  past_show, upcoming_show = partition_shows(payload['shows'])
   data['past_shows']= past_show
   data['upcoming_shows']= upcoming_show
   data['past_shows_count']= len(past_show)
@@ -336,6 +509,7 @@ def create_venue_form():
   return render_template('forms/new_venue.html', form=form)
 
 @app.route('/venues/create', methods=['POST'])
+@query_budget(5)
 def create_venue_submission():
   # TODO: insert form data as a new Venue record in the db, instead
   # TODO: modify data to be the data object returned from db insertion
@@ -355,12 +529,15 @@ def create_venue_submission():
       venue = Venue(name=name, city=city, state=state, address=address, phone=phone, genres=genres, image_link=image_link, facebook_link=facebook_link, website_link=website_link, seeking_talent=seeking_talent, seeking_description=seeking_description)
       
       db.session.add(venue)
+      db.session.flush()
+      venue_id = venue.id
+      refresh_stats(venue_ids=[venue_id])
       db.session.commit()
+      suggest_indexes['venue'].add(venue_id, name)
   except:
       error = True
-      print ('error 4')
       db.session.rollback()
-      print(sys.exc_info())
+      app.logger.exception('Could not create venue')
   finally:
       db.session.close()
   if error:
@@ -376,18 +553,24 @@ def create_venue_submission():
   return render_template('pages/home.html')
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
+@query_budget(14)
 def delete_venue(venue_id):
   # TODO: Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
   error = False
   try:
       venue = Venue.query.get(venue_id)
+      artist_ids = show_counterparts(Show.venue_id, Show.artist_id, venue_id)
       db.session.delete(venue)
+      db.session.flush()
+      refresh_stats(artist_ids=artist_ids)
       db.session.commit()
+      suggest_indexes['venue'].remove(int(venue_id))
+      invalidate_pages(venue_ids=[venue_id], artist_ids=artist_ids)
   except:
       error = True
       db.session.rollback()
-      print(sys.exc_info())
+      app.logger.exception('Could not delete venue %s', venue_id)
   finally:
       db.session.close()
   if error:
@@ -396,15 +579,33 @@ def delete_venue(venue_id):
     flash('Venue ' + venue_id + ' was successfully removed!')
   # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
   # clicking that button delete it from the db then redirect the user to the homepage
-  return None
+  return redirect(url_for('index'))
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@query_budget(1)
 def artists():
   # TODO: replace with real data returned from querying the database
 
-  data = db.session.query(Artist).all()
+  # Alphabetical keyset pagination on (name, id) over just the rendered columns.
+  # `after_name`/`after_id` is the cursor, `starts` jumps to a letter.
+  after_name = request.args.get('after_name')
+  after_id = request.args.get('after_id', type=int)
+  starts = request.args.get('starts', '')[:1].upper()
+  per_page = app.config['ARTISTS_PER_PAGE']
+
+  artistlist = db.session.query(Artist.id, Artist.name)
+  if after_name is not None and after_id is not None:
+    artistlist = artistlist.filter(tuple_(Artist.name, Artist.id) > tuple_(after_name, after_id))
+  elif starts:
+    artistlist = artistlist.filter(Artist.name >= starts)
+  artistlist = artistlist.order_by(Artist.name, Artist.id).limit(per_page + 1).all()
+
+  data = [{'id': artist_id, 'name': name} for artist_id, name in artistlist[:per_page]]
+  next_page = None
+  if len(artistlist) > per_page:
+    next_page = url_for('artists', after_name=data[-1]['name'], after_id=data[-1]['id'])
   #data=[{
   #  "id": 4,
   #  "name": "Guns N Petals",
@@ -415,22 +616,25 @@ def artists():
   #  "id": 6,
   #  "name": "The Wild Sax Band",
   #}]
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, letters=string.ascii_uppercase, next_page=next_page)
 
 @app.route('/artists/search', methods=['POST'])
+@query_budget(2)
 def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
   search_term = request.form.get('search_term', ' ')
-  artistsearch = Artist.query.filter(Artist.name.ilike("%" + search_term + "%")).all()
+  artistsearch = search(Artist, ArtistGenre.artist_id, search_term)
   
+  upcoming = upcoming_show_counts(ArtistStats.artist_id, ArtistStats.upcoming_shows_count, [artist.id for artist in artistsearch])
+
   data=[]
   counter=0
   for artist in artistsearch:
       artist_data = {'id': artist.id,
                     'name': artist.name,
-                    'numof_upcm_shows' : Show.query.filter_by(artist_id=artist.id).filter(Show.start_time > datetime.now()).count()}
+                    'numof_upcm_shows' : upcoming.get(artist.id, 0)}
       counter+=1
       data.append(artist_data)
 
@@ -449,39 +653,25 @@ def search_artists():
   #}
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
-@app.route('/artists/<int:artist_id>')
-def show_artist(artist_id):
-  # shows the artist page with the given artist_id
-  # TODO: replace with real artist data from the artist table, using artist_id
-  
-  data={}
+def artist_payload(artist_id):
+  # Everything the artist page shows, with each show's start time kept
+  # alongside it so the past/upcoming split can be redone on every hit.
   artistshow = Artist.query.get(artist_id)
-  pastshows = Show.query.join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time < datetime.now()).all()
-  print ('artistshow ', artistshow)
-  past_show=[]
-  for show in pastshows:
-    past_show.append({'venue_id': show.venue_id,
-                      'venue_name': show.venue.name,
-                      'venue_image_link': show.venue.image_link,
-                      'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')}
-                    )
+  if artistshow is None:
+    return None
 
-  upcomingshows = Show.query.join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time > datetime.now()).all()
+  # One query for all of the artist's shows, selecting only the venue columns
+  # the page needs.
+  artistshows = db.session.query(Show.venue_id, Venue.name, Venue.image_link, Show.start_time) \
+    .join(Venue, Show.venue_id == Venue.id) \
+    .filter(Show.artist_id == artist_id) \
+    .order_by(Show.start_time) \
+    .all()
 
-  upcoming_show=[]
-  for show in upcomingshows:
-    upcoming_show.append({'venue_id': show.venue_id,
-                          'venue_name': show.venue.name,
-                          'venue_image_link': show.venue.image_link,
-                          'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')}
-                        )
-    
-  print ('past show ', past_show)
-  print ('upcoming show ', upcoming_show)
-  
+  data={}
   data['id'] = artistshow.id
   data['name'] = artistshow.name
-  data['genres'] = artistshow.genres.strip('{}').split(',')
+  data['genres'] = list(artistshow.genres)
   data['city'] = artistshow.city
   data['state'] = artistshow.state
   data['phone'] = artistshow.phone
@@ -490,13 +680,35 @@ def show_artist(artist_id):
   data['seeking_venue'] = artistshow.seeking_venue
   data['seeking_description'] = artistshow.seeking_description
   data['image_link'] = artistshow.image_link
+  data['shows'] = [(start_time, {'venue_id': venue_id,
+                                 'venue_name': venue_name,
+                                 'venue_image_link': venue_image_link,
+                                 'start_time': start_time})
+                   for venue_id, venue_name, venue_image_link, start_time in artistshows]
+  return data
+
+@app.route('/artists/<int:artist_id>')
+@query_budget(4)
+@conditional(artist_validators)
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  # TODO: replace with real artist data from the artist table, using artist_id
+  payload = page_cache.get_or_set('artist:%d' % artist_id, lambda: artist_payload(artist_id), g.get('etag'))
+  if payload is None:
+    abort(404)
+
+  # Partition against a single timestamp, on every hit, so cached pages
+  # still move shows from upcoming to past as time passes.
+  data = {key: value for key, value in payload.items() if key != 'shows'}
+  past_show, upcoming_show = partition_shows(payload['shows'])
+
   data['past_shows'] = past_show
   data['upcoming_shows'] = upcoming_show
   data['past_shows_count'] = len(past_show)
   data['upcoming_shows_count'] = len(upcoming_show)
 
-  print ('data ', data)
-  
+  log_payload(app.logger, 'artist page', data)
+
   return render_template('pages/show_artist.html', artist=data)
   #data1={
   #  "id": 4,
@@ -575,10 +787,11 @@ def show_artist(artist_id):
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@query_budget(2)
 def edit_artist(artist_id):
   
   artist = Artist.query.filter_by(id=artist_id).first()
-  form = VenueForm(obj=artist)
+  form = ArtistForm(obj=artist)
 
   #artist={
   #  "id": 4,
@@ -597,6 +810,7 @@ def edit_artist(artist_id):
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@query_budget(6)
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
   # artist record with ID <artist_id> using the new attributes
@@ -605,22 +819,27 @@ def edit_artist_submission(artist_id):
   artist = Artist.query.get(artist_id)
 
   try: 
+    # Genres first: loading the current ones autoflushes, which would
+    # otherwise split the row update in two.
+    artist.genres = request.form.getlist('genres')
     artist.name = request.form['name']
     artist.city = request.form['city']
     artist.state = request.form['state']
     artist.phone = request.form['phone']
-    artist.genres = request.form.getlist('genres')
     artist.image_link = request.form['image_link']
     artist.facebook_link = request.form['facebook_link']
     artist.website_link = request.form['website_link']
     artist.seeking_venue = True if 'seeking_venue' in request.form else False 
     artist.seeking_description = request.form['seeking_description']
+    artist.updated_at = func.now()
 
     db.session.commit()
+    suggest_indexes['artist'].add(artist_id, request.form['name'])
+    invalidate_pages(venue_ids=show_counterparts(Show.artist_id, Show.venue_id, artist_id), artist_ids=[artist_id])
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('Could not update artist %s', artist_id)
   finally: 
     db.session.close()
   if error: 
@@ -631,6 +850,7 @@ def edit_artist_submission(artist_id):
   return redirect(url_for('show_artist', artist_id=artist_id))
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@query_budget(2)
 def edit_venue(venue_id):
   
   venue = Venue.query.filter_by(id=venue_id).first()
@@ -653,6 +873,7 @@ def edit_venue(venue_id):
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@query_budget(6)
 def edit_venue_submission(venue_id):
   # TODO: take values from the form submitted, and update existing
   # venue record with ID <venue_id> using the new attributes
@@ -660,23 +881,28 @@ def edit_venue_submission(venue_id):
   error = False  
   venue = Venue.query.get(venue_id)
   try: 
+    # Genres first: loading the current ones autoflushes, which would
+    # otherwise split the row update in two.
+    venue.genres = request.form.getlist('genres')
     venue.name = request.form['name']
     venue.city = request.form['city']
     venue.state = request.form['state']
     venue.address = request.form['address']
     venue.phone = request.form['phone']
-    venue.genres = request.form.getlist('genres')
     venue.image_link = request.form['image_link']
     venue.facebook_link = request.form['facebook_link']
     venue.website_link = request.form['website_link']
     venue.seeking_talent = True if 'seeking_talent' in request.form else False 
     venue.seeking_description = request.form['seeking_description']
+    venue.updated_at = func.now()
 
     db.session.commit()
+    suggest_indexes['venue'].add(venue_id, request.form['name'])
+    invalidate_pages(venue_ids=[venue_id], artist_ids=show_counterparts(Show.venue_id, Show.artist_id, venue_id))
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('Could not update venue %s', venue_id)
   finally: 
     db.session.close()
   if error: 
@@ -694,6 +920,7 @@ def create_artist_form():
   return render_template('forms/new_artist.html', form=form)
 
 @app.route('/artists/create', methods=['POST'])
+@query_budget(5)
 def create_artist_submission():
   # called upon submitting the new artist listing form
   # TODO: insert form data as a new Venue record in the db, instead
@@ -705,7 +932,7 @@ def create_artist_submission():
     city = request.form['city']
     state = request.form['state']
     phone = request.form['phone']
-    genres = request.form.getlist('genres'),
+    genres = request.form.getlist('genres')
     facebook_link = request.form['facebook_link']
     image_link = request.form['image_link']
     website_link = request.form['website_link']
@@ -714,11 +941,15 @@ def create_artist_submission():
 
     artist = Artist(name=name, city=city, state=state, phone=phone, genres=genres, facebook_link=facebook_link, image_link=image_link, website_link=website_link, seeking_venue=seeking_venue, seeking_description=seeking_description)
     db.session.add(artist)
+    db.session.flush()
+    artist_id = artist.id
+    refresh_stats(artist_ids=[artist_id])
     db.session.commit()
+    suggest_indexes['artist'].add(artist_id, name)
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('Could not create artist')
   finally: 
     db.session.close()
   if error: 
@@ -737,22 +968,48 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@query_budget(2)
+@conditional(lambda: listing_validators(Show, Venue, Artist))
 def shows():
   # displays list of shows at /shows
   # TODO: replace with real venues data.
 
-  showssearch = db.session.query(Show).join(Artist).join(Venue).all()
-
-  data = []
-  for show in showssearch: 
-    data.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name, 
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
+  # Keyset pagination on (start_time, id): by default only upcoming shows,
+  # `?window=all` includes past ones, `after_time`/`after_id` is the cursor.
+  window = request.args.get('window', 'upcoming')
+  after_time = request.args.get('after_time', type=lambda value: as_utc(datetime.fromisoformat(value)))
+  after_id = request.args.get('after_id', type=int)
+  per_page = app.config['SHOWS_PER_PAGE']
+
+  showssearch = db.session.query(Show.id, Show.venue_id, Venue.name, Show.artist_id, Artist.name, Artist.image_link, Show.start_time) \
+    .join(Artist, Show.artist_id == Artist.id) \
+    .join(Venue, Show.venue_id == Venue.id)
+  if window != 'all':
+    showssearch = showssearch.filter(Show.start_time >= utcnow())
+  if after_time is not None and after_id is not None:
+    showssearch = showssearch.filter(tuple_(Show.start_time, Show.id) > tuple_(after_time, after_id))
+  # Fetched before streaming, so the page's one query is in the budget and
+  # the Server-Timing header; the template still renders as it is sent.
+  rows = showssearch.order_by(Show.start_time, Show.id).limit(per_page + 1).all()
+
+  # Filled in by the generator once the page is exhausted; the template
+  # reads it after the show loop, so it is set by then.
+  pager = {'window': window, 'next': None}
+
+  def data():
+    for count, (show_id, venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time) in enumerate(rows):
+      if count == per_page:
+        pager['next'] = url_for('shows', window=window, after_time=last_start_time.isoformat(), after_id=last_id)
+        break
+      last_start_time, last_id = start_time, show_id
+      yield {
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": artist_image_link,
+        "start_time": start_time
+      }
 
   #data=[{
   #  "venue_id": 1,
@@ -790,7 +1047,7 @@ def shows():
   #  "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
   #  "start_time": "2035-04-15T20:00:00.000Z"
   #}]
-  return render_template('pages/shows.html', shows=data)
+  return stream_template('pages/shows.html', shows=data(), pager=pager)
 
 @app.route('/shows/create')
 def create_shows():
@@ -799,29 +1056,58 @@ def create_shows():
   return render_template('forms/new_show.html', form=form)
 
 @app.route('/shows/create', methods=['POST'])
+@query_budget(8)
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   # TODO: insert form data as a new Show record in the db, instead
   error = False
+  ends_first = too_long = False
+  conflicts = []
   try: 
     artist_id = request.form['artist_id']
     venue_id = request.form['venue_id']
-    start_time = request.form['start_time']
 
-    print(request.form)
-
-    show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
-    db.session.add(show)
-    db.session.commit()
+    log_payload(app.logger, 'show form', request.form.to_dict())
+
+    show = Show(artist_id=artist_id, venue_id=venue_id)
+    if request.form.get('start_time'):
+      # Entered times are UTC; left blank, the database fills in now().
+      show.start_time = as_utc(dateutil.parser.parse(request.form['start_time']))
+    if request.form.get('end_time'):
+      show.end_time = as_utc(dateutil.parser.parse(request.form['end_time']))
+
+    # Refuse double bookings up front; on Postgres the exclusion constraints
+    # also catch the ones that race past this check.
+    start_time = show.start_time or utcnow()
+    end_time = show.end_time or start_time + DEFAULT_SHOW_DURATION
+    # Both are CHECK constraints on shows; the overlap check only looks
+    # MAX_SHOW_DURATION back, which the second makes safe.
+    ends_first = end_time <= start_time
+    too_long = end_time - start_time > MAX_SHOW_DURATION
+    if not ends_first and not too_long:
+      conflicts = overlapping_shows(venue_id, artist_id, start_time, end_time)
+    if not ends_first and not too_long and not conflicts:
+      db.session.add(show)
+      db.session.flush()
+      refresh_stats(venue_ids=[venue_id], artist_ids=[artist_id])
+      db.session.commit()
+      invalidate_pages(venue_ids=[venue_id], artist_ids=[artist_id])
   except: 
     error = True
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('Could not create show')
   finally: 
     db.session.close()
-  if error: 
+  if ends_first:
+    flash('Show could not be added: it must end after it starts')
+  elif too_long:
+    flash('Show could not be added: shows last at most %d hours' % (MAX_SHOW_DURATION.total_seconds() // 3600))
+  elif conflicts:
+    flash('Show could not be added: the venue or the artist is already booked then (show '
+          + ', '.join('#%d' % conflict.id for conflict in conflicts) + ')')
+  elif error: 
     flash('Error occured while adding show')
-  if not error: 
+  else: 
     flash('Show was successfully added')
   # on successful db insert, flash success
   #flash('Show was successfully listed!')
@@ -838,16 +1124,68 @@ def not_found_error(error):
 def server_error(error):
     return render_template('errors/500.html'), 500
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to csv for *.csv files, ndjson otherwise.')
+@click.option('--batch-size', type=click.IntRange(1), help='Rows per transaction (IMPORT_BATCH_SIZE).')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Resume file (PATH.checkpoint).')
+@click.option('--errors', type=click.Path(dir_okay=False), help='Rejected rows report (PATH.errors.ndjson).')
+def import_command(kind, path, fmt, batch_size, checkpoint, errors):
+  """Bulk load venues, artists or shows from a CSV or NDJSON file."""
+  def after_batch(kind, rows):
+    if kind == 'shows':
+      venue_ids = {row['venue_id'] for row in rows}
+      artist_ids = {row['artist_id'] for row in rows}
+      refresh_stats(venue_ids=venue_ids, artist_ids=artist_ids)
+      db.session.commit()
+      invalidate_pages(venue_ids=venue_ids, artist_ids=artist_ids)
+
+  summary = import_file(kind, path, fmt=fmt, batch_size=batch_size or app.config['IMPORT_BATCH_SIZE'],
+                        checkpoint_path=checkpoint, errors_path=errors, after_batch=after_batch)
+  click.echo('%(imported)d imported, %(rejected)d rejected, %(skipped)d skipped (already processed)' % summary)
+
+@app.cli.group('stats')
+def stats_command():
+  """Maintain the venue_stats / artist_stats show counters."""
+
+@stats_command.command('roll')
+def roll_stats_command():
+  """Move shows that have started from upcoming to past (run every minute or so)."""
+  click.echo('%d rows rolled' % roll_stats())
+
+@stats_command.command('rebuild')
+def rebuild_stats_command():
+  """Recompute every row from the shows table."""
+  click.echo('%d rows rebuilt' % rebuild_stats())
+
+@app.cli.command('conflicts')
+def conflicts_command():
+  """List overlapping shows at the same venue or by the same artist."""
+  found = 0
+  for kind, entity_id, first, second in find_conflicts():
+    found += 1
+    click.echo('%s %d: show %d (%s - %s) overlaps show %d (%s - %s)' % (
+      kind, entity_id, first[2], first[0].isoformat(), first[1].isoformat(), second[2], second[0].isoformat(), second[1].isoformat()))
+  click.echo('%d conflicts' % found)
+  if found:
+    raise SystemExit(1)
+
+@app.cli.command('export')
+@click.argument('resource', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Defaults to stdout.')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson')
+@click.option('--after', type=int, help='Resume after this id (the last one already exported).')
+@click.option('--batch-size', type=click.IntRange(1), help='Rows fetched per round trip (EXPORT_BATCH_SIZE).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+def export_command(resource, output, fmt, after, batch_size, compress):
+  """Stream every venue, artist or show as NDJSON or CSV, ordered by id."""
+  for chunk in export(resource, fmt, after=after, batch_size=batch_size or app.config['EXPORT_BATCH_SIZE'], compress=compress):
+    output.write(chunk)
 
 #----------------------------------------------------------------------------#
 # Launch.
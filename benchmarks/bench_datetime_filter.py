@@ -0,0 +1,45 @@
+"""Throughput of the `datetime` Jinja filter.
+
+Compares the previous filter (strftime'd string -> dateutil parse -> Babel
+format_datetime) with app.format_datetime on datetime objects.
+
+    python benchmarks/bench_datetime_filter.py [iterations]
+"""
+import os
+import sys
+import timeit
+from datetime import datetime
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dateutil_compat  # noqa: E402,F401
+from app import format_datetime  # noqa: E402
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main(iterations=20000):
+    start_time = datetime(2035, 4, 1, 20, 0)
+    as_string = start_time.strftime('%Y-%m-%d %H:%M:%S')
+    assert legacy_format_datetime(as_string, 'full') == format_datetime(start_time, 'full')
+
+    for name, call in (
+        ('legacy (string)', lambda: legacy_format_datetime(as_string, 'full')),
+        ('current (string)', lambda: format_datetime(as_string, 'full')),
+        ('current (datetime)', lambda: format_datetime(start_time, 'full')),
+    ):
+        seconds = min(timeit.repeat(call, number=iterations, repeat=3))
+        print('%-20s %10.0f calls/s' % (name, iterations / seconds))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
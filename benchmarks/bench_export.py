@@ -0,0 +1,64 @@
+"""Throughput and memory of the streaming show export.
+
+Fills a scratch database with `shows` rows (10M by default) and streams
+them through exporter.export in each format, reporting rows/s, output size
+and peak RSS, which should stay flat as `shows` grows.
+
+    BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_export.py [shows]
+
+The tables are dropped and recreated, so point BENCH_DATABASE_URL at a
+scratch database (defaults to a SQLite file in the temp directory).
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app import app, db  # noqa: E402
+from exporter import export  # noqa: E402
+from models import Venue, Artist, Show  # noqa: E402
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fill(shows, venues=1000, artists=1000, batch=10000):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Venue.__table__.insert(), [
+        {'name': 'Venue %d' % i, 'city': 'San Francisco', 'state': 'CA', 'address': '%d Main St' % i, 'phone': '5550100'}
+        for i in range(venues)])
+    db.session.execute(Artist.__table__.insert(), [
+        {'name': 'Artist %d' % i, 'city': 'San Francisco', 'state': 'CA', 'phone': '5550100'}
+        for i in range(artists)])
+    start = datetime(2030, 1, 1, 20, 0)
+    for offset in range(0, shows, batch):
+        db.session.execute(Show.__table__.insert(), [
+            {'venue_id': i % venues + 1, 'artist_id': i % artists + 1, 'start_time': start + timedelta(hours=i)}
+            for i in range(offset, min(offset + batch, shows))])
+        db.session.commit()
+
+
+def main(shows=10000000):
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur_bench_export.db'))
+    with app.app_context():
+        began = time.perf_counter()
+        fill(shows)
+        print('filled %d shows in %.1fs, peak RSS %.0f MB' % (shows, time.perf_counter() - began, peak_rss_mb()))
+
+        for fmt, compress in (('ndjson', False), ('csv', False), ('csv', True)):
+            began = time.perf_counter()
+            size = sum(len(chunk) for chunk in export('shows', fmt, batch_size=app.config['EXPORT_BATCH_SIZE'], compress=compress))
+            seconds = time.perf_counter() - began
+            db.session.rollback()
+            print('%-6s gzip=%-5s %10.0f rows/s %8.1f MB out   peak RSS %.0f MB'
+                  % (fmt, compress, shows / seconds, size / 2 ** 20, peak_rss_mb()))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,133 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+class RedisCache:
+    """Cache shared by all workers, on any redis-py compatible client
+    (a fakeredis client can stand in for tests)."""
+
+    def __init__(self, client, ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, pickle.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+# Prefix of the entries holding each page key's current version.
+VERSION_PREFIX = 'version:'
+
+
+class PageCache:
+    """Read-through cache for page payloads, with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key, build, etag=None):
+        # `build` returning None (e.g. unknown id) is not cached. Payloads are
+        # stored with the `etag` of the rows they were built from; an entry
+        # with another one (e.g. stored before another worker's change, which
+        # could not invalidate this worker's cache) is built again.
+        #
+        # Neither is a payload whose key was invalidated while it was being
+        # built, since it may hold the rows from before the change:
+        # invalidate() replaces the key's version before deleting it, so a
+        # changed version after our set means the delete may already have
+        # run and missed it.
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] != etag:
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is not None:
+            return entry[1]
+        version = self.backend.get(VERSION_PREFIX + key)
+        value = build()
+        if value is not None:
+            self.backend.set(key, (etag, value))
+            if self.backend.get(VERSION_PREFIX + key) != version:
+                self.backend.delete(key)
+        return value
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.backend.set(VERSION_PREFIX + key, uuid.uuid4().hex)
+        self.backend.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def metrics(self):
+        # /metrics families; see metrics.collector.
+        yield ('fyyur_page_cache_hits_total', 'counter', 'Page payloads served from the cache.',
+               [('fyyur_page_cache_hits_total', {}, self.hits)])
+        yield ('fyyur_page_cache_misses_total', 'counter', 'Page payloads built on a cache miss.',
+               [('fyyur_page_cache_misses_total', {}, self.misses)])
+
+
+def create_cache(config):
+    # CACHE_BACKEND is 'lru' (per worker) or 'redis' (shared, needs the
+    # redis package and CACHE_REDIS_URL).
+    if config['CACHE_BACKEND'] == 'redis':
+        import redis
+        backend = RedisCache(redis.Redis.from_url(config['CACHE_REDIS_URL']), ttl=config['CACHE_TTL'])
+    else:
+        backend = LRUCache(maxsize=config['CACHE_MAXSIZE'], ttl=config['CACHE_TTL'])
+    return PageCache(backend)
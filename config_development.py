@@ -0,0 +1,9 @@
+from config import *
+
+# Local development (FYYUR_ENV=development, the default): debug mode with
+# template reloading, a local database, and a secret key generated once into
+# instance/secret_key unless FYYUR_SECRET_KEY is set.
+
+DEBUG = True
+
+SQLALCHEMY_DATABASE_URI = env('DATABASE_URL', 'postgresql://localhost:5432/fyyur')
@@ -0,0 +1,14 @@
+from config import *
+
+# Production (FYYUR_ENV=production): config.py's defaults, with per-render
+# template reload checks off and templates compiled at startup into a
+# bytecode cache the workers share. FYYUR_SECRET_KEY and FYYUR_DATABASE_URL
+# (or their _FILE variants) are required.
+
+TEMPLATES_AUTO_RELOAD = False
+JINJA_BYTECODE_CACHE_DIR = env('JINJA_CACHE_DIR', os.path.join(basedir, 'instance', 'jinja'))
+TEMPLATES_PRECOMPILE = True
+
+# Session cookies only over HTTPS; set FYYUR_SESSION_COOKIE_SECURE=0 behind
+# plain HTTP.
+SESSION_COOKIE_SECURE = env_flag('SESSION_COOKIE_SECURE', True)
@@ -0,0 +1,14 @@
+from config import *
+
+# Test runs (FYYUR_ENV=test): @query_budget raises, CSRF checks are off, the
+# database is in-memory SQLite unless FYYUR_DATABASE_URL is set, and the
+# secret key is fixed.
+
+TESTING = True
+WTF_CSRF_ENABLED = False
+
+SECRET_KEY = env('SECRET_KEY', 'fyyur-test-secret-key-not-for-production')
+
+SQLALCHEMY_DATABASE_URI = env('DATABASE_URL', 'sqlite://')
+
+LOG_LEVEL = env('LOG_LEVEL', 'WARNING')
@@ -0,0 +1,103 @@
+import heapq
+from bisect import bisect_left, insort
+from itertools import groupby
+
+from sqlalchemy import or_, select
+
+from models import db, Show, MAX_SHOW_DURATION
+from timeutil import as_utc
+
+#----------------------------------------------------------------------------#
+# Double-booking checks for shows, which occupy [start_time, end_time).
+#----------------------------------------------------------------------------#
+
+
+def overlapping_shows(venue_id, artist_id, start_time, end_time):
+    """Shows that overlap a booking of the venue or the artist in
+    [start_time, end_time). Both sides are range scans on the
+    (venue_id|artist_id, start_time) indexes, bounded below by the longest
+    a show can last."""
+    return db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+                Show.start_time < end_time,
+                Show.start_time > start_time - MAX_SHOW_DURATION,
+                Show.end_time > start_time) \
+        .order_by(Show.start_time, Show.id) \
+        .all()
+
+
+def booking_conflicts(batch):
+    """Errors for the (number, values) show rows of `batch` that overlap a
+    show already booked, or an earlier row of the batch, at the same venue
+    or by the same artist, keyed by record number like
+    importer.missing_references. The existing shows come from one query over
+    the batch's time span; the rows are then checked in memory."""
+    venue_ids = {values['venue_id'] for number, values in batch}
+    artist_ids = {values['artist_id'] for number, values in batch}
+    first = min(values['start_time'] for number, values in batch)
+    last = max(values['end_time'] for number, values in batch)
+    existing = db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+                Show.start_time < last,
+                Show.start_time > first - MAX_SHOW_DURATION,
+                Show.end_time > first)
+
+    # (column, id) -> [(start_time, end_time)] sorted by start.
+    booked = {}
+    for venue_id, artist_id, start_time, end_time in existing:
+        interval = (as_utc(start_time), as_utc(end_time))
+        booked.setdefault(('venue_id', venue_id), []).append(interval)
+        booked.setdefault(('artist_id', artist_id), []).append(interval)
+    for intervals in booked.values():
+        intervals.sort()
+
+    errors = {}
+    for number, values in batch:
+        start_time, end_time = values['start_time'], values['end_time']
+        keys = [(column, values[column]) for column in ('venue_id', 'artist_id')]
+        for key in keys:
+            # Only shows starting in (start - MAX_SHOW_DURATION, end) can overlap.
+            intervals = booked.get(key, [])
+            low = bisect_left(intervals, (start_time - MAX_SHOW_DURATION,))
+            high = bisect_left(intervals, (end_time,))
+            if any(other_end > start_time for other_start, other_end in intervals[low:high]):
+                errors.setdefault(number, {})[key[0]] = ['Already booked then.']
+        if number not in errors:
+            for key in keys:
+                insort(booked.setdefault(key, []), (start_time, end_time))
+    return errors
+
+
+def sweep(intervals):
+    """Overlapping pairs among (start, end, id) tuples sorted by start.
+
+    The heap holds the intervals still open at the current start, keyed by
+    end, so the sweep is O(n log n) plus one step per reported pair. Yields
+    ((start, end, id), (start, end, id)) with the earlier-starting one first.
+    """
+    active = []
+    for interval in intervals:
+        start = interval[0]
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for end, other in active:
+            yield other, interval
+        heapq.heappush(active, (interval[1], interval))
+
+
+def find_conflicts(batch_size=5000):
+    """Every pair of overlapping shows at the same venue or by the same artist.
+
+    Shows are streamed in (venue_id|artist_id, start_time) order, which the
+    database serves from its indexes, and swept one venue/artist at a time.
+    Yields (kind, entity_id, first, second) with first/second as
+    (start_time, end_time, show_id).
+    """
+    for kind, key in (('venue', Show.venue_id), ('artist', Show.artist_id)):
+        query = select(key, Show.start_time, Show.end_time, Show.id) \
+            .order_by(key, Show.start_time, Show.id) \
+            .execution_options(stream_results=True, yield_per=batch_size)
+        for entity_id, rows in groupby(db.session.execute(query), key=lambda row: row[0]):
+            intervals = ((as_utc(start_time), as_utc(end_time), show_id) for _, start_time, end_time, show_id in rows)
+            for first, second in sweep(intervals):
+                yield kind, entity_id, first, second
@@ -0,0 +1,7 @@
+import collections
+import collections.abc
+
+# python-dateutil 2.6 (requirements.txt) still uses collections.Callable,
+# which Python 3.10 removed. Import this module before parsing dates.
+if not hasattr(collections, 'Callable'):
+    collections.Callable = collections.abc.Callable
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool configuration and telemetry.
+#----------------------------------------------------------------------------#
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that also totals the time spent in checkout, waiting for a
+    free connection or opening a new one."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.timeouts = 0
+        self._timing_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            # pool_size + max_overflow are all checked out and none came back
+            # within pool_timeout.
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._timing_lock:
+                self.checkouts += 1
+                self.checkout_seconds += waited
+                self.timeouts += timed_out
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the DB_* settings.
+
+    Only PostgreSQL URLs are tuned; other databases keep Flask-SQLAlchemy's
+    defaults. With DB_PGBOUNCER the pool is left to PgBouncer (NullPool) and
+    no startup options are sent, since PgBouncer rejects them and keeps no
+    per-session state in transaction pooling mode.
+    """
+    if make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'postgresql':
+        return {}
+    if config['DB_PGBOUNCER']:
+        return {'poolclass': NullPool}
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']}
+    return options
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+
+    def apply_pool_defaults(self, app, options):
+        # Pool settings for the database URI in effect when the engine is
+        # created; SQLALCHEMY_ENGINE_OPTIONS still override them.
+        options = SQLAlchemy.apply_pool_defaults(self, app, options)
+        options.update(engine_options(app.config))
+        return options
+
+
+def pool_metrics(engine):
+    """/metrics families for the engine's pool."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    yield ('fyyur_db_pool_size', 'gauge', 'Connections the pool keeps open.',
+           [('fyyur_db_pool_size', {}, pool.size())])
+    yield ('fyyur_db_pool_checked_out', 'gauge', 'Connections in use.',
+           [('fyyur_db_pool_checked_out', {}, pool.checkedout())])
+    yield ('fyyur_db_pool_checked_in', 'gauge', 'Idle connections in the pool.',
+           [('fyyur_db_pool_checked_in', {}, pool.checkedin())])
+    yield ('fyyur_db_pool_overflow', 'gauge', 'Connections open beyond the pool size.',
+           [('fyyur_db_pool_overflow', {}, max(pool.overflow(), 0))])
+    if isinstance(pool, TimedQueuePool):
+        yield ('fyyur_db_pool_checkout_seconds', 'summary', 'Time spent checking out connections.',
+               [('fyyur_db_pool_checkout_seconds_count', {}, pool.checkouts),
+                ('fyyur_db_pool_checkout_seconds_sum', {}, pool.checkout_seconds)])
+        yield ('fyyur_db_pool_timeouts_total', 'counter', 'Checkouts that gave up after DB_POOL_TIMEOUT.',
+               [('fyyur_db_pool_timeouts_total', {}, pool.timeouts)])
@@ -0,0 +1,98 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import db, Venue, VenueGenre, Artist, ArtistGenre, Show
+from timeutil import as_utc
+
+#----------------------------------------------------------------------------#
+# Streaming export of venues, artists and shows as NDJSON or CSV.
+#----------------------------------------------------------------------------#
+
+# resource -> (model, genre model, genre key column)
+RESOURCES = {
+    'venues': (Venue, VenueGenre, VenueGenre.venue_id),
+    'artists': (Artist, ArtistGenre, ArtistGenre.artist_id),
+    'shows': (Show, None, None),
+}
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def fields(resource):
+    model, genre_model, genre_key = RESOURCES[resource]
+    names = [column.name for column in model.__table__.columns]
+    return names + (['genres'] if genre_model is not None else [])
+
+
+def export_batches(resource, after=None, batch_size=5000):
+    """Yield lists of up to `batch_size` row dicts, ordered by id.
+
+    Rows come from one server-side cursor, so memory stays flat whatever
+    the table size; genres are loaded with one query per batch. `after`
+    resumes the export past that id.
+    """
+    model, genre_model, genre_key = RESOURCES[resource]
+    query = select(model.__table__).order_by(model.id)
+    if after is not None:
+        query = query.where(model.id > after)
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.mappings().partitions(batch_size):
+        rows = [{key: as_utc(value) if isinstance(value, datetime) else value for key, value in row.items()}
+                for row in partition]
+        if genre_model is not None:
+            genres = {}
+            ids = [row['id'] for row in rows]
+            for entity_id, genre in db.session.query(genre_key, genre_model.genre).filter(genre_key.in_(ids)):
+                genres.setdefault(entity_id, []).append(genre)
+            for row in rows:
+                row['genres'] = genres.get(row['id'], [])
+        yield rows
+
+
+def csv_value(value):
+    # Spelled the way `flask import` reads them back.
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return ';'.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode(batches, fmt, names):
+    # One bytes chunk per batch (plus a header chunk for CSV).
+    if fmt == 'ndjson':
+        from api import dumps  # api imports this module
+        for rows in batches:
+            yield b''.join(dumps(row) + b'\n' for row in rows)
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        writer.writerows([csv_value(row[name]) for name in names] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_encode(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export(resource, fmt='ndjson', after=None, batch_size=5000, compress=False):
+    """Bytes chunks of the whole `resource` table in `fmt`, gzipped if asked."""
+    chunks = encode(export_batches(resource, after, batch_size), fmt, fields(resource))
+    return gzip_encode(chunks) if compress else chunks
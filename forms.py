@@ -1,8 +1,8 @@
-from datetime import datetime
-from flask_wtf import Form
+from flask_wtf import Form, FlaskForm
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, validators
 from wtforms.validators import DataRequired, AnyOf, URL, Regexp, optional
 from enumvalidation import Genre, State
+from timeutil import utcnow
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -14,7 +14,11 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        default=utcnow
+    )
+    end_time = DateTimeField(
+        'end_time',
+        validators=[optional()]
     )
 
 class VenueForm(Form):
@@ -44,7 +48,7 @@ class VenueForm(Form):
     )
     
     facebook_link = StringField(
-        'facebook_link', validators=[URL()]
+        'facebook_link', validators=[optional(), URL()]
     )
     website_link = StringField(
         'website_link'
@@ -59,10 +63,10 @@ class VenueForm(Form):
         rv = FlaskForm.validate(self)
         if not rv:
             return False
-        if all(elem in self.genres.data for elem in Genre.choices()):
+        if not set(self.genres.data) <= set(Genre.__members__):
             self.genres.errors.append('Invalid genre.')
             return False
-        if all(elem in self.state.data for elem in Genre.choices()):
+        if self.state.data not in State.__members__:
             self.state.errors.append('Invalid state.')
             return False
         # if pass validation
@@ -109,10 +113,10 @@ class ArtistForm(Form):
         rv = FlaskForm.validate(self)
         if not rv:
             return False
-        if all(elem in self.genres.data for elem in Genre.choices()):
+        if not set(self.genres.data) <= set(Genre.__members__):
             self.genres.errors.append('Invalid genre.')
             return False
-        if all(elem in self.state.data for elem in Genre.choices()):
+        if self.state.data not in State.__members__:
             self.state.errors.append('Invalid state.')
             return False
         # if pass validation
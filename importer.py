@@ -0,0 +1,282 @@
+import csv
+import io
+import json
+import os
+
+import dateutil.parser
+import dateutil_compat  # noqa: F401
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from conflicts import booking_conflicts
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, VenueGenre, Artist, ArtistGenre, Show, DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
+from timeutil import as_utc
+
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows from CSV or NDJSON files.
+#----------------------------------------------------------------------------#
+
+# kind -> (form, model, genre model, genre key column, columns written)
+KINDS = {
+    'venues': (VenueForm, Venue, VenueGenre, 'venue_id',
+               ['name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                'website_link', 'seeking_talent', 'seeking_description']),
+    'artists': (ArtistForm, Artist, ArtistGenre, 'artist_id',
+                ['name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                 'website_link', 'seeking_venue', 'seeking_description']),
+    'shows': (ShowForm, Show, None, None,
+              ['venue_id', 'artist_id', 'start_time', 'end_time']),
+}
+
+
+# seeking_talent / seeking_venue are String columns, so exports spell them
+# 'true'/'false' (PostgreSQL) or '1'/'0' (SQLite); NDJSON may use booleans.
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+TRUE_VALUES = ('true', '1', 'y', 'yes', 'on')
+
+# ShowForm's DateTimeField format.
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def read_records(path, fmt):
+    # Yields (record number, dict or None, errors), numbering data records
+    # from 1; errors is set for NDJSON lines that are not a JSON object.
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            for number, record in enumerate(csv.DictReader(source), 1):
+                yield number, record, None
+        else:
+            number = 0
+            for line in source:
+                if line.strip():
+                    number += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError as error:
+                        yield number, None, {'record': ['Not valid JSON: %s' % error]}
+                        continue
+                    if not isinstance(record, dict):
+                        yield number, None, {'record': ['Not a JSON object.']}
+                        continue
+                    yield number, record, None
+
+
+def parse_time(value):
+    # Show times are read the way the show form handler reads them: anything
+    # dateutil understands (e.g. ISO 8601 as exported), naive ones being UTC.
+    try:
+        return as_utc(dateutil.parser.parse(str(value)))
+    except (ValueError, OverflowError):
+        return None
+
+
+def validate(kind, record):
+    # Runs the record through the same form the HTML pages use. Genres may be
+    # a list or a ';'-separated string. Returns (values, errors).
+    form_class, model, genre_model, genre_key, columns = KINDS[kind]
+    formdata = MultiDict()
+    times = {}
+    time_errors = {}
+    for key, value in record.items():
+        if genre_model is None and key in ('start_time', 'end_time') and value:
+            # Handed to the form in the one format its DateTimeField takes.
+            times[key] = parse_time(value)
+            if times[key] is None:
+                time_errors[key] = ['Not a valid datetime value.']
+            else:
+                formdata.add(key, times[key].strftime(TIME_FORMAT))
+        elif key in BOOLEAN_FIELDS:
+            if str(value).strip().lower() in TRUE_VALUES:
+                formdata.add(key, 'y')
+        elif key == 'genres':
+            genres = value if isinstance(value, list) else str(value or '').split(';')
+            for genre in map(str, genres):
+                if genre.strip():
+                    formdata.add(key, genre.strip())
+        elif value is not None and value is not False:
+            formdata.add(key, str(value))
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    if not form.validate() or time_errors:
+        return None, dict(form.errors, **time_errors)
+    values = {column: form.data[column] for column in columns}
+    if genre_model is not None:
+        values['genres'] = form.genres.data
+    else:
+        errors = {}
+        for key in ('venue_id', 'artist_id'):
+            try:
+                values[key] = int(values[key])
+            except (TypeError, ValueError):
+                errors[key] = ['Not a valid id.']
+        if errors:
+            return None, errors
+        values['start_time'] = times['start_time']
+        values['end_time'] = times.get('end_time') or values['start_time'] + DEFAULT_SHOW_DURATION
+        if values['end_time'] - values['start_time'] > MAX_SHOW_DURATION:
+            return None, {'end_time': ['Shows last at most %s.' % MAX_SHOW_DURATION]}
+    return values, None
+
+
+def missing_references(batch):
+    # Show rows whose venue or artist does not exist, checked once per batch.
+    venue_ids = {values['venue_id'] for number, values in batch}
+    artist_ids = {values['artist_id'] for number, values in batch}
+    venues = {venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    artists = {artist_id for artist_id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    errors = {}
+    for number, values in batch:
+        if values['venue_id'] not in venues:
+            errors.setdefault(number, {})['venue_id'] = ['Unknown venue.']
+        if values['artist_id'] not in artists:
+            errors.setdefault(number, {})['artist_id'] = ['Unknown artist.']
+    return errors
+
+
+def copy_field(value):
+    # COPY's CSV format reads an unquoted empty field as NULL, so only None
+    # is written that way; everything else is quoted, keeping '' an empty
+    # string as an INSERT would. Booleans are spelled as PostgreSQL casts
+    # them to text, for the String seeking_* columns.
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        value = str(value).lower()
+    return '"%s"' % str(value).replace('"', '""')
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(map(copy_field, row)) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (table, ', '.join(columns)), buffer)
+
+
+def insert_batch_postgresql(kind, batch):
+    # COPY into the table; venues and artists reserve their ids from the
+    # sequence first so their genre rows can be COPYed as well.
+    form_class, model, genre_model, genre_key, columns = KINDS[kind]
+    table = model.__table__
+    cursor = db.session.connection().connection.cursor()
+    if genre_model is None:
+        copy_rows(cursor, table.name, columns, ([values[column] for column in columns] for number, values in batch))
+        return
+    cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", (table.name, len(batch)))
+    ids = [entity_id for entity_id, in cursor.fetchall()]
+    copy_rows(cursor, table.name, ['id'] + columns,
+              ([entity_id] + [values[column] for column in columns] for entity_id, (number, values) in zip(ids, batch)))
+    copy_rows(cursor, genre_model.__tablename__, [genre_key, 'genre'],
+              ((entity_id, genre) for entity_id, (number, values) in zip(ids, batch) for genre in values['genres']))
+
+
+def insert_batch(kind, batch):
+    # executemany for shows; venues and artists go through the ORM, which
+    # needs each new id back before it can batch the genre rows.
+    form_class, model, genre_model, genre_key, columns = KINDS[kind]
+    if genre_model is None:
+        db.session.execute(model.__table__.insert(), [values for number, values in batch])
+    else:
+        db.session.add_all([model(**values) for number, values in batch])
+        db.session.flush()
+
+
+class Checkpoint:
+    """Number of the last record of `path` that was committed or rejected."""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.position = 0
+        if os.path.exists(path):
+            with open(path) as saved:
+                state = json.load(saved)
+            if state['source'] != self.source:
+                raise ValueError('Checkpoint %s belongs to %s' % (path, state['source']))
+            self.position = state['position']
+
+    def save(self, position):
+        self.position = position
+        with open(self.path + '.tmp', 'w') as saved:
+            json.dump({'source': self.source, 'position': position}, saved)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def import_file(kind, path, fmt=None, batch_size=1000, checkpoint_path=None, errors_path=None, after_batch=None):
+    """Validate and insert the records of `path` in batches of `batch_size`.
+
+    Each committed batch advances the checkpoint, so a rerun resumes after
+    the last one. A batch the database refuses is split until the rows at
+    fault are isolated and rejected. Rejected records are appended to `errors_path` as NDJSON
+    ({"record": n, "errors": {...}}). `after_batch(kind, values)` is called
+    with the inserted rows of each committed batch. Returns a summary dict.
+    """
+    fmt = fmt or ('csv' if path.endswith('.csv') else 'ndjson')
+    checkpoint = Checkpoint(checkpoint_path or path + '.checkpoint', path)
+    insert = insert_batch_postgresql if db.engine.dialect.name == 'postgresql' else insert_batch
+    # COPY goes through the DBAPI cursor, so its errors are not wrapped.
+    database_errors = (SQLAlchemyError, db.engine.dialect.dbapi.Error)
+    summary = {'imported': 0, 'rejected': 0, 'skipped': checkpoint.position}
+
+    with open(errors_path or path + '.errors.ndjson', 'a') as report:
+        def reject(number, errors):
+            report.write(json.dumps({'record': number, 'errors': errors}) + '\n')
+            summary['rejected'] += 1
+
+        def commit(batch):
+            # Inserts `batch` in one transaction. When the database refuses it,
+            # each half is tried on its own, down to single rows, which are
+            # rejected; so one bad row costs only itself. The checkpoint
+            # follows each committed or rejected part, never past rows not
+            # tried yet.
+            last = batch[-1][0]
+            try:
+                insert(kind, batch)
+                db.session.commit()
+            except database_errors as error:
+                db.session.rollback()
+                if len(batch) > 1:
+                    middle = len(batch) // 2
+                    commit(batch[:middle])
+                    commit(batch[middle:])
+                    return
+                reject(last, {'database': [str(getattr(error, 'orig', error))]})
+                batch = []
+            summary['imported'] += len(batch)
+            report.flush()
+            checkpoint.save(last)
+            if batch and after_batch is not None:
+                after_batch(kind, [values for number, values in batch])
+
+        def flush(batch, position):
+            errors = missing_references(batch) if kind == 'shows' and batch else {}
+            batch = [(number, values) for number, values in batch if number not in errors]
+            if kind == 'shows' and batch:
+                # The exclusion constraints would only catch these on
+                # PostgreSQL, and only by failing the whole batch.
+                errors.update(booking_conflicts(batch))
+            for number in sorted(errors):
+                reject(number, errors[number])
+            batch = [(number, values) for number, values in batch if number not in errors]
+            if batch:
+                commit(batch)
+            report.flush()
+            checkpoint.save(position)
+
+        batch = []
+        position = checkpoint.position
+        for number, record, errors in read_records(path, fmt):
+            if number <= checkpoint.position:
+                continue
+            position = number
+            if record is not None:
+                values, errors = validate(kind, record)
+            if errors:
+                reject(number, errors)
+            else:
+                batch.append((number, values))
+            if len(batch) >= batch_size:
+                flush(batch, position)
+                batch = []
+        flush(batch, position)
+    return summary
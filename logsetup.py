@@ -0,0 +1,120 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+#----------------------------------------------------------------------------#
+# Structured, non-blocking logging.
+#----------------------------------------------------------------------------#
+
+# Attributes every LogRecord has; anything else on a record came in through
+# `extra=` and is written out as its own JSON field.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the id of the request being handled, if any."""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id,
+    the traceback if any, and the record's `extra=` fields."""
+
+    def format(self, record):
+        line = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line['exception'] = record.exc_text
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                line[name] = value
+        return json.dumps(line, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    # QueueHandler.prepare() folds the traceback into the message; keep it in
+    # exc_text instead so it ends up in its own JSON field.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+@atexit.register
+def _stop_listener():
+    # Flushes the records still queued.
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _start_request():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.log_payloads = random.random() < current_app.config['LOG_PAYLOAD_SAMPLE_RATE']
+
+
+def _finish_request(response):
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def init_app(app):
+    """Send log records through a queue to a listener thread that writes
+    JSON lines to LOG_FILE (stderr when unset), so request handlers never
+    block on log I/O."""
+    global _listener
+    _stop_listener()
+
+    target = logging.FileHandler(app.config['LOG_FILE']) if app.config['LOG_FILE'] else logging.StreamHandler(sys.stderr)
+    target.setFormatter(JSONFormatter())
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+    _listener = QueueListener(records, target, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if isinstance(h, _QueueHandler)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config['LOG_LEVEL'])
+    # app.logger propagates to the root logger instead of printing itself.
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def log_payload(logger, message, payload):
+    """Debug-level dump of a request's data, written for the sampled
+    fraction (LOG_PAYLOAD_SAMPLE_RATE) of requests only."""
+    if logger.isEnabledFor(logging.DEBUG) and g.get('log_payloads'):
+        logger.debug(message, extra={'payload': payload})
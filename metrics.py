@@ -0,0 +1,342 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from flask import Blueprint, Response, current_app, g, request
+from flask.signals import before_render_template, signals_available, template_rendered
+
+metrics = Blueprint('metrics', __name__)
+
+#----------------------------------------------------------------------------#
+# Prometheus text exposition.
+#----------------------------------------------------------------------------#
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request latencies, in seconds.
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+_collectors = []
+
+
+def collector(collect):
+    """Register a callable yielding metric families for /metrics.
+
+    A family is (name, type, help, samples) with samples as
+    (sample_name, labels, value) tuples, e.g.
+    ('fyyur_db_pool_checked_out', 'gauge', '...', [('fyyur_db_pool_checked_out', {}, 3)]).
+    """
+    _collectors.append(collect)
+    return collect
+
+
+class Metric:
+    """Base for the metrics recorded on request paths.
+
+    Each thread updates its own shard of values, so recording takes no lock;
+    collect() adds the shards up. When a thread goes away its shard is
+    folded into a retired total, so threads coming and going (e.g. a
+    threaded server's one per request) don't grow the list of shards.
+    """
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._local = threading.local()
+        # id(shard) -> shard, for the live threads.
+        self._shards = {}
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+        collector(self.collect)
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards[id(values)] = values
+            weakref.finalize(threading.current_thread(), self._retire, values)
+            return values
+
+    def _retire(self, values):
+        # The thread is gone, so nothing writes to `values` any more.
+        with self._shards_lock:
+            del self._shards[id(values)]
+            for key, value in values.items():
+                self._retired[key] = self._add(self._retired.get(key), value)
+
+    def _merged(self):
+        # dict.copy() runs without releasing the GIL, so a thread adding a
+        # key to its shard meanwhile can't break the iteration. The retired
+        # total is copied with the list of shards, so a shard retired while
+        # this runs is counted once.
+        with self._shards_lock:
+            shards = list(self._shards.values())
+            merged = {key: self._add(None, value) for key, value in self._retired.items()}
+        for shard in shards:
+            for key, value in shard.copy().items():
+                merged[key] = self._add(merged.get(key), value)
+        return merged
+
+    def _add(self, total, value):
+        return value if total is None else total + value
+
+    def collect(self):
+        samples = [(self.name, dict(zip(self.labels, key)), value) for key, value in sorted(self._merged().items())]
+        yield self.name, self.kind, self.help, samples
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        # Per key: a count per bucket (the last one +Inf), then the sum.
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            values = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def _add(self, total, value):
+        value = list(value)
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+    def collect(self):
+        samples = []
+        for key, values in sorted(self._merged().items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                samples.append((self.name + '_bucket', dict(labels, le='+Inf' if bound == float('inf') else repr(float(bound))), cumulative))
+            samples.append((self.name + '_sum', labels, values[-1]))
+            samples.append((self.name + '_count', labels, cumulative))
+        yield self.name, self.kind, self.help, samples
+
+
+REQUESTS = Counter('fyyur_http_requests_total', 'Requests handled.', ('endpoint', 'method', 'status'))
+LATENCY = Histogram('fyyur_http_request_duration_seconds', 'Time to handle a request, including streamed bodies.', ('endpoint',))
+IN_PROGRESS = Gauge('fyyur_http_requests_in_progress', 'Requests being handled.', ('endpoint',))
+DB_TIME = Histogram('fyyur_http_request_db_seconds', 'Time spent in SQL statements per request.', ('endpoint',))
+TEMPLATE_TIME = Histogram('fyyur_http_request_template_seconds', 'Time spent rendering templates per request.', ('endpoint',))
+TEMPLATE_RENDER = Histogram('fyyur_template_render_seconds', 'Time to render each template, with the templates it extends and includes; for streamed ones, not counting time spent sending.', ('template',))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += '{%s}' % ','.join('%s="%s"' % (key, _escape(label)) for key, label in sorted(labels.items()))
+    return '%s %s' % (name, float(value) if isinstance(value, bool) else value)
+
+
+def families():
+    for collect in _collectors:
+        yield from collect()
+
+
+#----------------------------------------------------------------------------#
+# Multiprocess mode.
+#----------------------------------------------------------------------------#
+
+# With METRICS_MULTIPROC_DIR set, each process writes its families to
+# <dir>/<pid>.json every METRICS_FLUSH_SECONDS and at exit, and /metrics adds
+# up the files of all processes: counters, histograms and summaries from
+# every file (so counts from restarted workers are kept), gauges from live
+# processes only, labelled with their pid.
+
+_flushed_at = 0.0
+
+
+def _snapshot_path(directory, pid):
+    return os.path.join(directory, '%d.json' % pid)
+
+
+def flush(directory):
+    global _flushed_at
+    _flushed_at = time.monotonic()
+    path = _snapshot_path(directory, os.getpid())
+    partial = '%s.%d.tmp' % (path, threading.get_ident())
+    with open(partial, 'w') as out:
+        json.dump(list(families()), out)
+    os.replace(partial, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merged_families(directory):
+    # This process's families are read live, the others' from their files.
+    snapshots = [(os.getpid(), list(families()))]
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        pid = int(os.path.basename(path)[:-len('.json')])
+        if pid == os.getpid():
+            continue
+        try:
+            with open(path) as snapshot:
+                snapshots.append((pid, json.load(snapshot)))
+        except (OSError, ValueError):
+            continue
+
+    merged = {}
+    for pid, snapshot in snapshots:
+        live = pid == os.getpid() or _alive(pid)
+        for name, kind, help, samples in snapshot:
+            family = merged.setdefault(name, (kind, help, {}))
+            if kind == 'gauge':
+                if not live:
+                    continue
+                samples = [(sample, dict(labels, pid=pid), value) for sample, labels, value in samples]
+            for sample, labels, value in samples:
+                key = (sample, tuple(sorted((label, str(text)) for label, text in labels.items())))
+                family[2][key] = family[2].get(key, 0) + value
+    for name, (kind, help, samples) in merged.items():
+        yield name, kind, help, [(sample, dict(labels), value) for (sample, labels), value in samples.items()]
+
+
+def render():
+    directory = current_app.config['METRICS_MULTIPROC_DIR']
+    lines = []
+    for name, kind, help, samples in (merged_families(directory) if directory else families()):
+        lines.append('# HELP %s %s' % (name, _escape(help)))
+        lines.append('# TYPE %s %s' % (name, kind))
+        lines.extend(_sample(*sample) for sample in samples)
+    return '\n'.join(lines) + '\n'
+
+
+@metrics.route('/metrics')
+def expose():
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#----------------------------------------------------------------------------#
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.template_seconds = 0.0
+    IN_PROGRESS.inc(_endpoint())
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(error):
+    # Runs when the request context is torn down, after any streamed body
+    # has been sent.
+    started = g.get('metrics_started')
+    if started is None:
+        return
+    endpoint = _endpoint()
+    LATENCY.observe(time.perf_counter() - started, endpoint)
+    IN_PROGRESS.dec(endpoint)
+    REQUESTS.inc(endpoint, request.method, str(500 if error is not None else g.get('metrics_status', 500)))
+    stats = g.get('sqlstats')
+    if stats is not None:
+        DB_TIME.observe(stats.seconds, endpoint)
+    TEMPLATE_TIME.observe(g.template_seconds, endpoint)
+
+    directory = current_app.config['METRICS_MULTIPROC_DIR']
+    if directory and time.monotonic() - _flushed_at >= current_app.config['METRICS_FLUSH_SECONDS']:
+        flush(directory)
+
+
+def _template_started(app, template, context):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+
+def _template_finished(app, template, context):
+    started = g.get('template_started')
+    if started:
+        elapsed = time.perf_counter() - started.pop()
+        g.template_seconds += elapsed
+        TEMPLATE_RENDER.observe(elapsed, template.name)
+
+
+def timed_render(template_name, chunks):
+    """Yield the chunks of a streamed render of `template_name`, recording
+    its render time as the signals below do for render_template (which
+    streaming does not send). Only the time spent producing chunks counts,
+    not the time the server spends sending them."""
+    elapsed = 0.0
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - started
+        yield chunk
+    if 'template_seconds' in g:
+        g.template_seconds += elapsed
+    TEMPLATE_RENDER.observe(elapsed, template_name)
+
+
+def init_app(app):
+    """Record request counts, latency, DB and template time per endpoint.
+    Template time of render_template needs blinker for Flask's signals;
+    without it only streamed renders (see timed_render) are timed."""
+    # Registered first, so the other before_request hooks are timed too.
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    # after_request hooks run in reverse, so this one sees the final status.
+    app.after_request_funcs.setdefault(None, []).insert(0, _record_status)
+    app.teardown_request(_finish_request)
+    if signals_available:
+        before_render_template.connect(_template_started, app)
+        template_rendered.connect(_template_finished, app)
+
+    directory = app.config['METRICS_MULTIPROC_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+        @atexit.register
+        def flush_at_exit():
+            with app.app_context():
+                flush(directory)
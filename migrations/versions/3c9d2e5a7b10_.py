@@ -0,0 +1,33 @@
+"""add shows indexes
+
+Revision ID: 3c9d2e5a7b10
+Revises: f4a34bb7eae9
+Create Date: 2026-10-18 09:12:44.318021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9d2e5a7b10'
+down_revision = 'f4a34bb7eae9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Detail pages and upcoming counts filter shows by venue_id / artist_id
+    # plus a start_time range; the INCLUDEd counterpart id lets the detail
+    # page join be answered from the index (Postgres only, ignored elsewhere).
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.create_index('ix_shows_venue_id_start_time', ['venue_id', 'start_time'], unique=False, postgresql_include=['artist_id'])
+        batch_op.create_index('ix_shows_artist_id_start_time', ['artist_id', 'start_time'], unique=False, postgresql_include=['venue_id'])
+        batch_op.create_index('ix_shows_start_time', ['start_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.drop_index('ix_shows_start_time')
+        batch_op.drop_index('ix_shows_artist_id_start_time')
+        batch_op.drop_index('ix_shows_venue_id_start_time')
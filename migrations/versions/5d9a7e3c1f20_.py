@@ -0,0 +1,54 @@
+"""add shows.end_time and reject overlapping shows
+
+Revision ID: 5d9a7e3c1f20
+Revises: c6e2b9d4a815
+Create Date: 2026-10-18 19:47:16.730284
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9a7e3c1f20'
+down_revision = 'c6e2b9d4a815'
+branch_labels = None
+depends_on = None
+
+EXCLUSIONS = (
+    ('shows_venue_id_during_excl', 'venue_id'),
+    ('shows_artist_id_during_excl', 'artist_id'),
+)
+
+
+def upgrade():
+    # Existing shows are given the default two hours.
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE shows SET end_time = start_time + interval '2 hours'")
+    else:
+        op.execute("UPDATE shows SET end_time = datetime(start_time, '+2 hours')")
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(timezone=True), nullable=False)
+        batch_op.create_check_constraint('ck_shows_end_time_after_start_time', 'end_time > start_time')
+
+    # No two shows at one venue, or by one artist, with overlapping
+    # [start_time, end_time). btree_gist provides the integer equality
+    # operator class for the GiST index. Existing overlaps make this fail;
+    # `flask conflicts` lists them.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for name, column in EXCLUSIONS:
+        op.execute('ALTER TABLE shows ADD CONSTRAINT %s EXCLUDE USING gist '
+                   '(%s WITH =, tstzrange(start_time, end_time) WITH &&)' % (name, column))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, column in reversed(EXCLUSIONS):
+            op.drop_constraint(name, 'shows')
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_shows_end_time_after_start_time', type_='check')
+        batch_op.drop_column('end_time')
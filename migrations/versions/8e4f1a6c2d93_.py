@@ -0,0 +1,27 @@
+"""add artists name index
+
+Revision ID: 8e4f1a6c2d93
+Revises: 3c9d2e5a7b10
+Create Date: 2026-10-18 10:03:27.904415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4f1a6c2d93'
+down_revision = '3c9d2e5a7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backs the alphabetical keyset pagination of the /artists listing.
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.create_index('ix_artists_name_id', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.drop_index('ix_artists_name_id')
@@ -0,0 +1,31 @@
+"""add state indexes for search
+
+Revision ID: 9a1c5e7f3b24
+Revises: 5d9a7e3c1f20
+Create Date: 2026-10-18 18:20:11.506342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a1c5e7f3b24'
+down_revision = '5d9a7e3c1f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Search matches the term against state codes in a SELECT of its own.
+    with op.batch_alter_table('venues', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_venues_state'), ['state'], unique=False)
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_artists_state'), ['state'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('artists', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_artists_state'))
+    with op.batch_alter_table('venues', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_venues_state'))
@@ -0,0 +1,55 @@
+"""store timestamps as timestamptz, default shows.start_time to now() in the database
+
+Revision ID: a4f8c2e61d37
+Revises: e7c3a9f05b62
+Create Date: 2026-10-18 17:42:10.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f8c2e61d37'
+down_revision = 'e7c3a9f05b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # start_time values were written by the app without a zone and are taken
+    # as UTC; updated_at came from the database's now(), so it is read in the
+    # session's zone, which is what the plain cast does.
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.alter_column('start_time',
+               existing_type=sa.DateTime(),
+               type_=sa.DateTime(timezone=True),
+               server_default=sa.text('CURRENT_TIMESTAMP'),
+               existing_nullable=False,
+               postgresql_using="start_time AT TIME ZONE 'UTC'")
+    for table in ('venues', 'artists', 'shows'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at',
+                   existing_type=sa.DateTime(),
+                   type_=sa.DateTime(timezone=True),
+                   existing_server_default=sa.text('CURRENT_TIMESTAMP'),
+                   existing_nullable=False,
+                   postgresql_using='updated_at::timestamptz')
+
+
+def downgrade():
+    for table in ('shows', 'artists', 'venues'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at',
+                   existing_type=sa.DateTime(timezone=True),
+                   type_=sa.DateTime(),
+                   existing_server_default=sa.text('CURRENT_TIMESTAMP'),
+                   existing_nullable=False,
+                   postgresql_using='updated_at::timestamp')
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.alter_column('start_time',
+               existing_type=sa.DateTime(timezone=True),
+               type_=sa.DateTime(),
+               server_default=None,
+               existing_nullable=False,
+               postgresql_using="start_time AT TIME ZONE 'UTC'")
@@ -0,0 +1,109 @@
+"""move genres to venue_genres / artist_genres
+
+Revision ID: b5a0d7c41e28
+Revises: 8e4f1a6c2d93
+Create Date: 2026-10-18 11:26:05.117830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5a0d7c41e28'
+down_revision = '8e4f1a6c2d93'
+branch_labels = None
+depends_on = None
+
+# Snapshot of enumvalidation.Genre at the time of this migration (name -> value).
+GENRES = {
+    'Alternative': 'Alternative',
+    'Blues': 'Blues',
+    'Classical': 'Classical',
+    'Country': 'Country',
+    'Electronic': 'Electronic',
+    'Folk': 'Folk',
+    'Funk': 'Funk',
+    'HipHop': 'Hip-Hop',
+    'HeavyMetal': 'Heavy Metal',
+    'Instrumental': 'Instrumental',
+    'Jazz': 'Jazz',
+    'MusicalTheatre': 'Musical Theatre',
+    'Pop': 'Pop',
+    'Punk': 'Punk',
+    'RnB': 'R&B',
+    'Reggae': 'Reggae',
+    'RocknRoll': 'Rock n Roll',
+    'Soul': 'Soul',
+    'Other': 'Other',
+}
+GENRE_BY_VALUE = {value: name for name, value in GENRES.items()}
+
+genre_type = sa.Enum(*GENRES, name='genre').with_variant(
+    postgresql.ENUM(*GENRES, name='genre', create_type=False), 'postgresql')
+
+
+def parse_genres(value):
+    # The old columns held Postgres array literals such as '{Jazz,"Rock n Roll"}'.
+    genres = []
+    for genre in (value or '').strip('{}').split(','):
+        genre = genre.strip().strip('"')
+        genre = genre if genre in GENRES else GENRE_BY_VALUE.get(genre)
+        if genre and genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        postgresql.ENUM(*GENRES, name='genre').create(bind, checkfirst=True)
+
+    op.create_table('venue_genres',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre', genre_type, nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['venues.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre')
+    )
+    op.create_index('ix_venue_genres_genre_venue_id', 'venue_genres', ['genre', 'venue_id'], unique=False)
+    op.create_table('artist_genres',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre', genre_type, nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['artists.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre')
+    )
+    op.create_index('ix_artist_genres_genre_artist_id', 'artist_genres', ['genre', 'artist_id'], unique=False)
+
+    for table, genre_table, key in (('venues', 'venue_genres', 'venue_id'), ('artists', 'artist_genres', 'artist_id')):
+        source = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        target = sa.table(genre_table, sa.column(key, sa.Integer), sa.column('genre', sa.String))
+        rows = [{key: row.id, 'genre': genre}
+                for row in bind.execute(sa.select(source.c.id, source.c.genres))
+                for genre in parse_genres(row.genres)]
+        if rows:
+            op.bulk_insert(target, rows)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, genre_table, key in (('venues', 'venue_genres', 'venue_id'), ('artists', 'artist_genres', 'artist_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+
+        source = sa.table(genre_table, sa.column(key, sa.Integer), sa.column('genre', sa.String))
+        target = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        genres = {}
+        for row in bind.execute(sa.select(source.c[key], source.c.genre)):
+            genres.setdefault(row[0], []).append(row[1])
+        for entity_id, names in genres.items():
+            bind.execute(target.update().where(target.c.id == entity_id).values(genres='{' + ','.join(names) + '}'))
+
+    op.drop_index('ix_artist_genres_genre_artist_id', table_name='artist_genres')
+    op.drop_table('artist_genres')
+    op.drop_index('ix_venue_genres_genre_venue_id', table_name='venue_genres')
+    op.drop_table('venue_genres')
+    if bind.dialect.name == 'postgresql':
+        postgresql.ENUM(name='genre').drop(bind, checkfirst=True)
@@ -0,0 +1,31 @@
+"""add table_versions
+
+Revision ID: b8d3f1a6c072
+Revises: 9a1c5e7f3b24
+Create Date: 2026-10-18 18:41:27.730915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d3f1a6c072'
+down_revision = '9a1c5e7f3b24'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows', 'venue_stats', 'artist_stats')
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('deletes', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_versions, [{'name': name} for name in TABLES])
+
+
+def downgrade():
+    op.drop_table('table_versions')
@@ -0,0 +1,32 @@
+"""cap show durations at 24 hours
+
+Revision ID: c4e7a2d9f813
+Revises: b8d3f1a6c072
+Create Date: 2026-10-18 19:02:38.114270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a2d9f813'
+down_revision = 'b8d3f1a6c072'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # models.MAX_SHOW_DURATION; overlap checks rely on it to bound their
+    # range scans. Existing longer shows make this fail.
+    if op.get_bind().dialect.name == 'postgresql':
+        condition = "end_time <= start_time + interval '24 hours'"
+    else:
+        condition = 'julianday(end_time) - julianday(start_time) <= 1'
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.create_check_constraint('ck_shows_duration_at_most_24_hours', condition)
+
+
+def downgrade():
+    with op.batch_alter_table('shows', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_shows_duration_at_most_24_hours', type_='check')
@@ -0,0 +1,53 @@
+"""add venue_stats and artist_stats
+
+Revision ID: c6e2b9d4a815
+Revises: a4f8c2e61d37
+Create Date: 2026-10-18 18:30:52.046113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e2b9d4a815'
+down_revision = 'a4f8c2e61d37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key, parent in (('venue_stats', 'venue_id', 'venues'), ('artist_stats', 'artist_id', 'artists')):
+        op.create_table(table,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('next_show_time', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_show_time', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.ForeignKeyConstraint([key], ['%s.id' % parent], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(key)
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_%s_next_show_time' % table), ['next_show_time'], unique=False)
+            batch_op.create_index(batch_op.f('ix_%s_updated_at' % table), ['updated_at'], unique=False)
+
+        # One row per existing venue/artist, counted as of the migration.
+        op.execute("""
+            INSERT INTO {table} ({key}, upcoming_shows_count, past_shows_count, next_show_time, last_show_time)
+            SELECT {parent}.id,
+                   SUM(CASE WHEN shows.start_time >= CURRENT_TIMESTAMP THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN shows.start_time < CURRENT_TIMESTAMP THEN 1 ELSE 0 END),
+                   MIN(CASE WHEN shows.start_time >= CURRENT_TIMESTAMP THEN shows.start_time END),
+                   MAX(CASE WHEN shows.start_time < CURRENT_TIMESTAMP THEN shows.start_time END)
+            FROM {parent} LEFT JOIN shows ON shows.{key} = {parent}.id
+            GROUP BY {parent}.id
+        """.format(table=table, key=key, parent=parent))
+
+
+def downgrade():
+    for table in ('artist_stats', 'venue_stats'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f('ix_%s_updated_at' % table))
+            batch_op.drop_index(batch_op.f('ix_%s_next_show_time' % table))
+        op.drop_table(table)
@@ -0,0 +1,41 @@
+"""add trigram search indexes
+
+Revision ID: d21f6b83c0e4
+Revises: b5a0d7c41e28
+Create Date: 2026-10-18 12:41:50.662190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd21f6b83c0e4'
+down_revision = 'b5a0d7c41e28'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_venues_name_trgm', 'venues', 'name'),
+    ('ix_venues_city_trgm', 'venues', 'city'),
+    ('ix_artists_name_trgm', 'artists', 'name'),
+    ('ix_artists_city_trgm', 'artists', 'city'),
+)
+
+
+def upgrade():
+    # Trigram GIN indexes back the ILIKE '%term%' and similarity search in
+    # app.search(); other dialects fall back to plain scans.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, column in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,26 @@
+"""add table_versions.deleted_at
+
+Revision ID: d2f7b4e8a193
+Revises: c4e7a2d9f813
+Create Date: 2026-10-18 20:14:52.306817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7b4e8a193'
+down_revision = 'c4e7a2d9f813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('table_versions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('table_versions', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,32 @@
+"""add updated_at to venues, artists and shows
+
+Revision ID: e7c3a9f05b62
+Revises: d21f6b83c0e4
+Create Date: 2026-10-18 14:08:31.271554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3a9f05b62'
+down_revision = 'd21f6b83c0e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows get the migration time, which only costs clients one
+    # extra full response after the upgrade.
+    for table in ('venues', 'artists', 'shows'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+            batch_op.create_index(batch_op.f('ix_%s_updated_at' % table), ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('shows', 'artists', 'venues'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f('ix_%s_updated_at' % table))
+            batch_op.drop_column('updated_at')
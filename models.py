@@ -0,0 +1,205 @@
+from datetime import timedelta
+from sqlalchemy import event, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.ext.associationproxy import association_proxy
+from enumvalidation import Genre
+from replicas import RoutingSQLAlchemy
+from timeutil import utcnow, as_utc
+
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+class Venue(db.Model):
+    __tablename__ = 'venues'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120), index=True)
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genre_rows = db.relationship('VenueGenre', cascade='all, delete-orphan', lazy=True)
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: VenueGenre(genre=genre))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.String(120))
+    seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+    show = db.relationship('Show', backref='venues', lazy=True)
+    stats = db.relationship('VenueStats', uselist=False, cascade='all, delete-orphan', lazy=True)
+
+    def __repr__(self):
+        return f'<Venue ID: {self.id}, Name: {self.name}>'
+
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+class Artist(db.Model):
+    __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_id', 'name', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120), index=True)
+    phone = db.Column(db.String(120))
+    genre_rows = db.relationship('ArtistGenre', cascade='all, delete-orphan', lazy=True)
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: ArtistGenre(genre=genre))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.String(120))
+    seeking_description = db.Column(db.String(120))
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+    show = db.relationship('Show', backref='artists', lazy=True)
+    stats = db.relationship('ArtistStats', uselist=False, cascade='all, delete-orphan', lazy=True)
+
+    def __repr__(self):
+        return f'<Artist ID: {self.id}, Name: {self.name}>'
+
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+
+# Shows created without an end time are booked for this long.
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+# No show lasts longer (a CHECK constraint added by migration c4e7a2d9f813),
+# so overlap checks only look this far back before a booking's start.
+MAX_SHOW_DURATION = timedelta(hours=24)
+
+def default_end_time(context):
+    # From the inserted start_time, or from now when the database fills it in.
+    start_time = context.get_current_parameters().get('start_time')
+    return (as_utc(start_time) if start_time else utcnow()) + DEFAULT_SHOW_DURATION
+
+class ShowDurationCap(ColumnElement):
+    # The MAX_SHOW_DURATION cap of migration c4e7a2d9f813, spelled per dialect.
+    pass
+
+@compiles(ShowDurationCap)
+def compile_show_duration_cap(element, compiler, **kw):
+    return 'julianday(end_time) - julianday(start_time) <= 1'
+
+@compiles(ShowDurationCap, 'postgresql')
+def compile_show_duration_cap_postgresql(element, compiler, **kw):
+    return "end_time <= start_time + interval '24 hours'"
+
+class Show(db.Model):
+    # Shows occupy [start_time, end_time). On PostgreSQL the exclusion
+    # constraints added by migration 5d9a7e3c1f20 reject overlapping shows
+    # at the same venue or by the same artist; see conflicts.py for the
+    # checks that work everywhere.
+    __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time', postgresql_include=['artist_id']),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time', postgresql_include=['venue_id']),
+        db.Index('ix_shows_start_time', 'start_time'),
+        db.CheckConstraint('end_time > start_time', name='ck_shows_end_time_after_start_time'),
+        db.CheckConstraint(ShowDurationCap(), name='ck_shows_duration_at_most_24_hours'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime(timezone=True), server_default=func.now(), nullable=False)
+    end_time = db.Column(db.DateTime(timezone=True), default=default_end_time, nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+    venue = db.relationship('Venue', backref=db.backref('shows', cascade='all, delete'))
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
+    artist = db.relationship('Artist', backref=db.backref('shows', cascade='all, delete'))
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<Show ID: {self.id}, Time: {self.start_time} - {self.end_time} , Venue ID: {self.venue_id}, Artist ID: {self.artist_id}>'
+
+# Genres are stored one row per (venue|artist, genre), keyed by the Genre
+# member name, with a (genre, id) index for "venues/artists for genre X".
+genre_type = db.Enum(*Genre.__members__, name='genre')
+
+class VenueGenre(db.Model):
+    __tablename__ = 'venue_genres'
+    __table_args__ = (
+        db.Index('ix_venue_genres_genre_venue_id', 'genre', 'venue_id'),
+    )
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(genre_type, primary_key=True)
+
+    def __repr__(self):
+        return f'<VenueGenre Venue ID: {self.venue_id}, Genre: {self.genre}>'
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'artist_genres'
+    __table_args__ = (
+        db.Index('ix_artist_genres_genre_artist_id', 'genre', 'artist_id'),
+    )
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(genre_type, primary_key=True)
+
+    def __repr__(self):
+        return f'<ArtistGenre Artist ID: {self.artist_id}, Genre: {self.genre}>'
+
+# Show counts per venue/artist, kept up to date by stats.refresh_stats on every
+# show write. "Upcoming" is relative to when the row was refreshed, so rows
+# whose next_show_time has passed are due for `flask stats roll`.
+class VenueStats(db.Model):
+    __tablename__ = 'venue_stats'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, server_default='0', nullable=False)
+    past_shows_count = db.Column(db.Integer, server_default='0', nullable=False)
+    next_show_time = db.Column(db.DateTime(timezone=True), index=True)
+    last_show_time = db.Column(db.DateTime(timezone=True))
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<VenueStats Venue ID: {self.venue_id}, Upcoming: {self.upcoming_shows_count}, Past: {self.past_shows_count}>'
+
+class ArtistStats(db.Model):
+    __tablename__ = 'artist_stats'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, server_default='0', nullable=False)
+    past_shows_count = db.Column(db.Integer, server_default='0', nullable=False)
+    next_show_time = db.Column(db.DateTime(timezone=True), index=True)
+    last_show_time = db.Column(db.DateTime(timezone=True))
+    updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ArtistStats Artist ID: {self.artist_id}, Upcoming: {self.upcoming_shows_count}, Past: {self.past_shows_count}>'
+
+# Rows ever deleted from each listed table, bumped by the flush that deletes
+# them. Inserts and updates move a table's max(updated_at); these counters let
+# the listing pages notice deletes too, without counting the tables.
+VERSIONED_TABLES = ('venues', 'artists', 'shows', 'venue_stats', 'artist_stats')
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String(64), primary_key=True)
+    deletes = db.Column(db.BigInteger, server_default='0', nullable=False)
+    # When the last delete happened, for Last-Modified; deletes tells apart
+    # two within the same second.
+    deleted_at = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return f'<TableVersion Table: {self.name}, Deletes: {self.deletes}, Deleted at: {self.deleted_at}>'
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def add_table_versions(table, connection, **kwargs):
+    connection.execute(table.insert(), [{'name': name} for name in VERSIONED_TABLES])
+
+@event.listens_for(db.session, 'after_flush')
+def count_deletes(session, flush_context):
+    # ORM deletes only; bulk Query.delete() and ON DELETE CASCADE bypass this.
+    names = sorted({instance.__table__.name for instance in session.deleted} & set(VERSIONED_TABLES))
+    if names:
+        session.connection().execute(TableVersion.__table__.update()
+                                     .where(TableVersion.name.in_(names))
+                                     .values(deletes=TableVersion.deletes + 1, deleted_at=func.now()))
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
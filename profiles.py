@@ -0,0 +1,126 @@
+import logging
+import os
+import secrets
+import tempfile
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+
+#----------------------------------------------------------------------------#
+# Configuration profiles.
+#----------------------------------------------------------------------------#
+
+# FYYUR_ENV -> settings module.
+PROFILES = {
+    'development': 'config_development',
+    'test': 'config_test',
+    'production': 'config_production',
+}
+ALIASES = {'dev': 'development', 'testing': 'test', 'prod': 'production'}
+
+# Settings that must be whole numbers of at least 1.
+POSITIVE = ('SHOWS_PER_PAGE', 'ARTISTS_PER_PAGE', 'SEARCH_LIMIT', 'SUGGEST_LIMIT', 'CACHE_MAXSIZE', 'API_PAGE_SIZE',
+            'API_MAX_PAGE_SIZE', 'IMPORT_BATCH_SIZE', 'EXPORT_BATCH_SIZE', 'DB_POOL_SIZE', 'DB_POOL_TIMEOUT')
+# Settings that must be whole numbers.
+INTEGER = ('DB_MAX_OVERFLOW', 'DB_POOL_RECYCLE', 'DB_STATEMENT_TIMEOUT_MS')
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def instance_secret_key(instance_path):
+    """The key in instance/secret_key, generated on first use. Workers
+    starting together agree on whichever one is written first."""
+    path = os.path.join(instance_path, 'secret_key')
+    os.makedirs(instance_path, exist_ok=True)
+    if os.path.exists(path):
+        with open(path) as existing:
+            return existing.read().strip()
+    # Written in full to a file of its own, then linked into place, so no
+    # worker ever reads a secret_key that is still being written.
+    key = secrets.token_hex(32)
+    descriptor, partial = tempfile.mkstemp(dir=instance_path, prefix='secret_key.')
+    try:
+        with os.fdopen(descriptor, 'w') as new:
+            new.write(key)
+        os.link(partial, path)
+    except FileExistsError:
+        with open(path) as existing:
+            return existing.read().strip()
+    finally:
+        os.unlink(partial)
+    return key
+
+
+def problems(config, profile):
+    """What is wrong with `config` for `profile`, as a list of messages."""
+    found = []
+    if not config['SECRET_KEY']:
+        found.append('SECRET_KEY is not set (FYYUR_SECRET_KEY or FYYUR_SECRET_KEY_FILE)')
+    elif profile == 'production' and len(config['SECRET_KEY']) < 32:
+        found.append('SECRET_KEY must be at least 32 characters')
+
+    uris = [('SQLALCHEMY_DATABASE_URI', config['SQLALCHEMY_DATABASE_URI'])]
+    uris += [('SQLALCHEMY_REPLICA_URIS', uri) for uri in config['SQLALCHEMY_REPLICA_URIS']]
+    for name, uri in uris:
+        if not uri:
+            found.append('%s is not set (FYYUR_DATABASE_URL or FYYUR_DATABASE_URL_FILE)' % name)
+            continue
+        try:
+            make_url(uri)
+        except ArgumentError:
+            found.append('%s is not a database URL' % name)
+
+    if profile == 'production':
+        for name in ('DEBUG', 'TESTING'):
+            if config[name]:
+                found.append('%s must be off in production' % name)
+        if not config.get('WTF_CSRF_ENABLED', True):
+            found.append('WTF_CSRF_ENABLED must be on in production')
+
+    for name in POSITIVE:
+        if not isinstance(config[name], int) or config[name] < 1:
+            found.append('%s must be a whole number of at least 1' % name)
+    for name in INTEGER:
+        if not isinstance(config[name], int):
+            found.append('%s must be a whole number' % name)
+    if isinstance(config['DB_MAX_OVERFLOW'], int) and config['DB_MAX_OVERFLOW'] < 0:
+        found.append('DB_MAX_OVERFLOW must not be negative')
+    sizes = config['API_PAGE_SIZE'], config['API_MAX_PAGE_SIZE']
+    if all(isinstance(size, int) for size in sizes) and sizes[0] > sizes[1]:
+        found.append('API_PAGE_SIZE must not be over API_MAX_PAGE_SIZE')
+    if config['CACHE_BACKEND'] not in ('lru', 'redis'):
+        found.append("CACHE_BACKEND must be 'lru' or 'redis'")
+    if not 0 <= config['LOG_PAYLOAD_SAMPLE_RATE'] <= 1:
+        found.append('LOG_PAYLOAD_SAMPLE_RATE must be between 0 and 1')
+    if not isinstance(logging.getLevelName(str(config['LOG_LEVEL']).upper()), int):
+        found.append('LOG_LEVEL must be a logging level name')
+    return found
+
+
+def load(app, profile=None):
+    """Configure `app` for `profile` (FYYUR_ENV, default development).
+
+    The profile's settings module is loaded first, then instance/settings.py
+    and the file named by FYYUR_SETTINGS, if they exist; later ones win.
+    Raises ConfigError listing every problem found.
+    """
+    profile = profile or os.environ.get('FYYUR_ENV', 'development')
+    profile = ALIASES.get(profile, profile)
+    if profile not in PROFILES:
+        raise ConfigError('FYYUR_ENV must be one of %s, not %r' % (', '.join(PROFILES), profile))
+
+    app.config.from_object(PROFILES[profile])
+    app.config.from_pyfile(os.path.join(app.instance_path, 'settings.py'), silent=True)
+    if os.environ.get('FYYUR_SETTINGS'):
+        app.config.from_envvar('FYYUR_SETTINGS')
+    app.config['FYYUR_ENV'] = profile
+    app.config['LOG_LEVEL'] = str(app.config['LOG_LEVEL']).upper()
+
+    if not app.config['SECRET_KEY'] and profile == 'development':
+        app.config['SECRET_KEY'] = instance_secret_key(app.instance_path)
+
+    found = problems(app.config, profile)
+    if found:
+        raise ConfigError('Invalid %s configuration:\n  %s' % (profile, '\n  '.join(found)))
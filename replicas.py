@@ -0,0 +1,140 @@
+import itertools
+import logging
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import create_engine, event, orm
+
+from dbpool import PooledSQLAlchemy, engine_options
+from metrics import collector
+
+logger = logging.getLogger('fyyur.replicas')
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Requests with these methods read from a replica; any other method is a
+# write and pins the client to the primary for REPLICA_STICKY_SECONDS.
+READ_METHODS = ('GET', 'HEAD')
+
+
+class Replica:
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.up = True
+        self.checked_at = float('-inf')
+
+
+class ReplicaSet:
+    """Replica engines, taken in turn, skipping the ones that failed their
+    last health check. A replica is checked again at most every
+    `check_seconds`."""
+
+    def __init__(self, engines, check_seconds):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.check_seconds = check_seconds
+        self._turn = itertools.count()
+        for index, replica in enumerate(self.replicas):
+            event.listen(replica.engine, 'handle_error', self._error_handler(index, replica))
+
+    def choose(self):
+        # An engine to read from, or None to use the primary.
+        now = time.monotonic()
+        for _ in self.replicas:
+            index = next(self._turn) % len(self.replicas)
+            replica = self.replicas[index]
+            if now - replica.checked_at >= self.check_seconds:
+                self.check(index, replica, now)
+            if replica.up:
+                return replica.engine
+        return None
+
+    def check(self, index, replica, now):
+        # A raw DBAPI round trip, so it stays out of the per-request SQL stats.
+        replica.checked_at = now
+        try:
+            connection = replica.engine.raw_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+            finally:
+                connection.close()
+        except Exception:
+            if replica.up:
+                logger.warning('Replica %d is down, reading from the primary', index, exc_info=True)
+            replica.up = False
+        else:
+            if not replica.up:
+                logger.info('Replica %d is back up', index)
+            replica.up = True
+
+    def _error_handler(self, index, replica):
+        # A lost connection takes the replica out until its next check, so
+        # only the request that hit it fails.
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                if replica.up:
+                    logger.warning('Replica %d is down, reading from the primary', index)
+                replica.up = False
+                replica.checked_at = time.monotonic()
+        return handle_error
+
+    def metrics(self):
+        # /metrics families; see metrics.collector.
+        if not self.replicas:
+            return
+        yield ('fyyur_db_replica_up', 'gauge', 'Whether the replica passed its last health check.',
+               [('fyyur_db_replica_up', {'replica': index}, int(replica.up))
+                for index, replica in enumerate(self.replicas)])
+
+
+class RoutingSession(SignallingSession):
+    """Session that reads from the replica picked for the current request,
+    if any; flushes and everything outside a read request use the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('replica') if has_request_context() else None
+        if replica is not None and not self._flushing:
+            return replica
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(PooledSQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def replica_set(app):
+    # Engines are created on first use, so settings changed after init_app
+    # (e.g. in tests) still apply.
+    replicas = app.extensions.get('replicas')
+    if replicas is None:
+        engines = [create_engine(uri, **engine_options(dict(app.config, SQLALCHEMY_DATABASE_URI=uri)))
+                   for uri in app.config['SQLALCHEMY_REPLICA_URIS']]
+        replicas = app.extensions['replicas'] = ReplicaSet(engines, app.config['REPLICA_CHECK_SECONDS'])
+    return replicas
+
+
+def _route_request():
+    if not current_app.config['SQLALCHEMY_REPLICA_URIS']:
+        return
+    if request.method not in READ_METHODS:
+        # Read-your-writes: this client's reads go to the primary until the
+        # replicas have had time to catch up.
+        session['primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+        return
+    if session.get('primary_until', 0) > time.time():
+        return
+    g.replica = replica_set(current_app).choose()
+
+
+def init_app(app):
+    """Send read requests to SQLALCHEMY_REPLICA_URIS, when any are set.
+    The setting is read when replicas are first used, not here."""
+    app.before_request(_route_request)
+    collector(lambda: replica_set(app).metrics())
@@ -0,0 +1,130 @@
+import functools
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.sql')
+
+#----------------------------------------------------------------------------#
+# Per-request SQL statistics.
+#----------------------------------------------------------------------------#
+
+# Literals and expanded IN lists vary between executions of the same query;
+# fingerprints replace them so repeats (an N+1 loop) share one key.
+_IN_LIST = re.compile(r'\bIN \((?:[^()]*)\)', re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    statement = _LITERAL.sub('?', statement)
+    statement = _IN_LIST.sub('IN (?)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestStats:
+    """Statements issued while handling one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def repeated(self, threshold):
+        return {statement: count for statement, count in self.fingerprints.items() if count >= threshold}
+
+
+def current_stats():
+    # The stats of the request being handled, or None outside a request or
+    # when SQLSTATS_ENABLED is off.
+    if has_request_context():
+        return g.get('sqlstats')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('sqlstats_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get('sqlstats_started')
+    if stats is None or not started:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started.pop()
+    stats.fingerprints[fingerprint(statement)] += 1
+
+
+def _start_request():
+    g.sqlstats = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.get('sqlstats')
+    if stats is None:
+        return response
+    # Statements a streamed body issues while it is sent come after this
+    # header; query_budget still counts them, once the body is done.
+    response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d statements"' % (stats.seconds * 1000, stats.count))
+    repeated = stats.repeated(current_app.config['SQLSTATS_REPEAT_THRESHOLD'])
+    logger.log(logging.WARNING if repeated else logging.INFO,
+               '%s %s: %d statements in %.1fms', request.method, request.path, stats.count, stats.seconds * 1000,
+               extra={'sql': {'endpoint': request.endpoint, 'statements': stats.count,
+                              'db_ms': round(stats.seconds * 1000, 3), 'repeated': repeated}})
+    return response
+
+
+def init_app(app):
+    """Count statements per request when SQLSTATS_ENABLED is set."""
+    if not app.config['SQLSTATS_ENABLED']:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def _check_budget(stats, limit, endpoint, testing):
+    if stats.count > limit:
+        message = '%s issued %d statements, over its budget of %d: %r' % (
+            endpoint, stats.count, limit, dict(stats.fingerprints))
+        if testing:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={'sql': {'endpoint': endpoint, 'statements': stats.count, 'budget': limit}})
+
+
+def query_budget(limit):
+    """Declare the most statements a view may issue.
+
+    Going over raises QueryBudgetExceeded when the app is testing (so the
+    test fails) and logs a warning otherwise. A streamed response is checked
+    once its body has been sent, so the statements issued while rendering it
+    count too. Does nothing when SQLSTATS_ENABLED is off.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            response = view(*args, **kwargs)
+            stats = current_stats()
+            if stats is None:
+                return response
+            check = functools.partial(_check_budget, stats, limit, request.endpoint, current_app.testing)
+            if isinstance(response, Response) and response.is_streamed:
+                response.call_on_close(check)
+            else:
+                check()
+            return response
+        return wrapper
+    return decorator
@@ -2,3 +2,55 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Navbar search suggestions from /api/suggest, for forms marked data-suggest.
+(function () {
+  var forms = document.querySelectorAll('form.search[data-suggest]');
+  Array.prototype.forEach.call(forms, function (form) {
+    var input = form.querySelector('input[name="search_term"]');
+    var list = document.createElement('ul');
+    var pending = null;
+    var timer = null;
+    list.className = 'suggestions';
+    form.appendChild(list);
+
+    function render(suggestions) {
+      list.innerHTML = '';
+      suggestions.forEach(function (suggestion) {
+        var item = document.createElement('li');
+        var link = document.createElement('a');
+        link.href = suggestion.url;
+        link.textContent = suggestion.name;
+        item.appendChild(link);
+        list.appendChild(item);
+      });
+    }
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var query = input.value.trim();
+        if (pending) {
+          pending.abort();
+        }
+        if (!query) {
+          render([]);
+          return;
+        }
+        pending = new XMLHttpRequest();
+        pending.open('GET', '/api/suggest?type=' + form.getAttribute('data-suggest') + '&q=' + encodeURIComponent(query));
+        pending.onload = function () {
+          if (this.status === 200) {
+            render(JSON.parse(this.responseText).suggestions);
+          }
+        };
+        pending.send();
+      }, 80);
+    });
+
+    input.addEventListener('blur', function () {
+      // Leave time for a click on a suggestion to register.
+      setTimeout(function () { render([]); }, 200);
+    });
+  });
+})();
@@ -0,0 +1,95 @@
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Venue, VenueStats, Artist, ArtistStats, Show
+from timeutil import utcnow
+
+#----------------------------------------------------------------------------#
+# Maintenance of the venue_stats / artist_stats counter tables.
+#----------------------------------------------------------------------------#
+
+# stats model -> (its key column, the matching shows column)
+SIDES = (
+    (VenueStats, VenueStats.venue_id, Show.venue_id),
+    (ArtistStats, ArtistStats.artist_id, Show.artist_id),
+)
+
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+STAT_COLUMNS = ('upcoming_shows_count', 'past_shows_count', 'next_show_time', 'last_show_time')
+
+
+def compute(key, ids, now):
+    # One grouped query over the shows of `ids`; ids without shows get zeros.
+    upcoming = Show.start_time >= now
+    past = Show.start_time < now
+    rows = db.session.query(
+            key,
+            func.sum(case((upcoming, 1), else_=0)),
+            func.sum(case((past, 1), else_=0)),
+            func.min(case((upcoming, Show.start_time))),
+            func.max(case((past, Show.start_time)))) \
+        .filter(key.in_(ids)) \
+        .group_by(key)
+    stats = {entity_id: dict(zip(STAT_COLUMNS, (0, 0, None, None))) for entity_id in ids}
+    for entity_id, *values in rows:
+        stats[entity_id] = dict(zip(STAT_COLUMNS, values))
+    return stats
+
+
+def write(model, key, stats):
+    rows = [dict(values, **{key.name: entity_id}) for entity_id, values in stats.items()]
+    insert = UPSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        db.session.query(model).filter(key.in_(list(stats))).delete(synchronize_session=False)
+        db.session.execute(model.__table__.insert(), rows)
+        return
+    statement = insert(model.__table__)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[key.name],
+        set_=dict({name: getattr(statement.excluded, name) for name in STAT_COLUMNS}, updated_at=func.now())), rows)
+
+
+def refresh(side, ids):
+    # The existing rows are locked first, so concurrent refreshes of the same
+    # id queue up and the later one counts the earlier one's shows.
+    model, key, show_key = side
+    ids = sorted({int(entity_id) for entity_id in ids})
+    if not ids:
+        return
+    db.session.query(key).filter(key.in_(ids)).with_for_update().all()
+    write(model, key, compute(show_key, ids, utcnow()))
+
+
+def refresh_stats(venue_ids=(), artist_ids=()):
+    """Recompute the stats rows of the given venues and artists, in the
+    caller's transaction, after its show writes."""
+    for side, ids in zip(SIDES, (venue_ids, artist_ids)):
+        refresh(side, ids)
+
+
+def refresh_in_batches(side, ids, batch_size):
+    for start in range(0, len(ids), batch_size):
+        refresh(side, ids[start:start + batch_size])
+        db.session.commit()
+    return len(ids)
+
+
+def roll_stats(batch_size=1000):
+    """Refresh the rows whose next show has started, moving it from upcoming
+    to past. Returns the number of venue and artist rows refreshed."""
+    rolled = 0
+    for side in SIDES:
+        model, key, show_key = side
+        ids = [entity_id for entity_id, in db.session.query(key).filter(model.next_show_time <= utcnow())]
+        rolled += refresh_in_batches(side, ids, batch_size)
+    return rolled
+
+
+def rebuild_stats(batch_size=1000):
+    """Recompute every venue and artist row, e.g. after a bulk load."""
+    rebuilt = 0
+    for entity, side in zip((Venue, Artist), SIDES):
+        ids = [entity_id for entity_id, in db.session.query(entity.id).order_by(entity.id)]
+        rebuilt += refresh_in_batches(side, ids, batch_size)
+    return rebuilt
@@ -0,0 +1,83 @@
+import bisect
+import threading
+import time
+import unicodedata
+
+
+def normalize(text):
+    # Case- and accent-insensitive form used for both keys and queries.
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+class PrefixIndex:
+    """In-memory autocomplete index over (id, name) pairs.
+
+    Every word start of a normalized name is a key in a sorted list, so a
+    prefix lookup is a bisect plus a short scan, and "hop" finds
+    "The Musical Hop". Updates are incremental; `rebuild` swaps in a fresh
+    list built from the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []  # sorted (key, id, name)
+        self._keys = {}     # id -> keys of that id, for removal
+        self.built_at = None
+
+    @staticmethod
+    def _word_keys(name):
+        words = normalize(name).split(' ')
+        return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+    def is_stale(self, max_age):
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def rebuild(self, rows):
+        entries = []
+        keys = {}
+        for entity_id, name in rows:
+            keys[entity_id] = self._word_keys(name)
+            entries.extend((key, entity_id, name) for key in keys[entity_id])
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+            self.built_at = time.monotonic()
+
+    def add(self, entity_id, name):
+        # Insert or replace the entry for `entity_id`.
+        with self._lock:
+            self._remove(entity_id)
+            self._keys[entity_id] = self._word_keys(name)
+            for key in self._keys[entity_id]:
+                bisect.insort(self._entries, (key, entity_id, name))
+
+    def remove(self, entity_id):
+        with self._lock:
+            self._remove(entity_id)
+
+    def _remove(self, entity_id):
+        for key in self._keys.pop(entity_id, ()):
+            position = bisect.bisect_left(self._entries, (key, entity_id))
+            if position < len(self._entries) and self._entries[position][:2] == (key, entity_id):
+                del self._entries[position]
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries = self._entries
+        results = []
+        seen = set()
+        position = bisect.bisect_left(entries, (prefix,))
+        while position < len(entries) and len(results) < limit:
+            key, entity_id, name = entries[position]
+            if not key.startswith(prefix):
+                break
+            if entity_id not in seen:
+                seen.add(entity_id)
+                results.append((entity_id, name))
+            position += 1
+        return results
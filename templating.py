@@ -0,0 +1,37 @@
+import logging
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger('fyyur.templates')
+
+#----------------------------------------------------------------------------#
+# Jinja environment tuning.
+#----------------------------------------------------------------------------#
+
+
+def precompile(app):
+    """Compile every .html template into the environment's cache (and the
+    bytecode cache, if set), so no request pays for it. Returns the number
+    of templates compiled; a template with a syntax error fails here."""
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    logger.info('Compiled %d templates in %.1fms', len(names), (time.perf_counter() - started) * 1000)
+    return len(names)
+
+
+def init_app(app):
+    """Apply JINJA_BYTECODE_CACHE_DIR and TEMPLATES_PRECOMPILE.
+
+    With a bytecode cache, templates compiled by one worker (or at an
+    earlier start) are loaded by the others without parsing them again.
+    """
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    if app.config['TEMPLATES_PRECOMPILE']:
+        precompile(app)
@@ -0,0 +1,93 @@
+import os
+from datetime import timedelta
+
+import pytest
+from flask import g
+
+# Settings are read when app.py is imported.
+os.environ['FYYUR_ENV'] = 'test'
+
+import app as fyyur
+from cache import create_cache
+from models import db, Venue, Artist, Show
+from stats import rebuild_stats
+from timeutil import utcnow
+
+#----------------------------------------------------------------------------#
+# Fixtures.
+#----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # Fresh tables and an empty page cache for every test; the app itself is
+    # the module-level one, configured by config_test.
+    monkeypatch.setattr(fyyur, 'page_cache', create_cache(fyyur.app.config))
+    with fyyur.app.app_context():
+        db.create_all()
+    yield fyyur.app
+    with fyyur.app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(scope='module')
+def pg_app():
+    # The app pointed at FYYUR_TEST_DATABASE_URL, with the model tables
+    # dropped and created again, once per module of tests marked postgres.
+    url = os.environ.get('FYYUR_TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('FYYUR_TEST_DATABASE_URL is not set')
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(fyyur, 'page_cache', create_cache(fyyur.app.config))
+        monkeypatch.setitem(fyyur.app.config, 'SQLALCHEMY_DATABASE_URI', url)
+        with fyyur.app.app_context():
+            db.drop_all()
+            db.create_all()
+        yield fyyur.app
+        with fyyur.app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed():
+    """seed(venues=, artists=, shows_per_venue=) adds rows to the database of
+    the `app` or `pg_app` fixture and returns the new venue and artist ids.
+    Half of the shows are in the past."""
+    def seed(venues=0, artists=1, shows_per_venue=0):
+        with fyyur.app.app_context():
+            new_artists = [Artist(name='Artist %d' % i, city='San Francisco', state='CA', genres=['Jazz'])
+                           for i in range(artists)]
+            new_venues = [Venue(name='Venue %d' % i, city=('San Francisco', 'New York')[i % 2],
+                                state=('CA', 'NY')[i % 2], address='1 Main St', genres=['Jazz', 'Blues'])
+                          for i in range(venues)]
+            db.session.add_all(new_artists + new_venues)
+            db.session.flush()
+            # Three hours apart, so nothing is double-booked.
+            first = utcnow() + timedelta(minutes=30) - timedelta(hours=3) * (venues * shows_per_venue // 2)
+            for index, venue in enumerate(new_venues):
+                for j in range(shows_per_venue):
+                    start_time = first + timedelta(hours=3) * (index * shows_per_venue + j)
+                    db.session.add(Show(venue_id=venue.id, artist_id=new_artists[j % artists].id, start_time=start_time))
+            db.session.commit()
+            rebuild_stats()
+            return [venue.id for venue in new_venues], [artist.id for artist in new_artists]
+    return seed
+
+
+@pytest.fixture
+def statements(client):
+    """statements(method, url, **kwargs) -> (response, SQL statements the
+    request issued), from the request's g.sqlstats."""
+    def statements(method, url, **kwargs):
+        with client:
+            response = client.open(url, method=method, **kwargs)
+            return response, g.sqlstats.count
+    return statements
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+from flask import Response, g, stream_with_context
+from sqlalchemy import text
+
+import app as fyyur
+from models import db, Venue, Artist, Show
+from sqlstats import QueryBudgetExceeded, RequestStats, query_budget
+
+VENUE = {'name': 'New Venue', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+         'phone': '', 'genres': ['Jazz'], 'image_link': '', 'facebook_link': '',
+         'website_link': '', 'seeking_description': ''}
+ARTIST = {'name': 'New Artist', 'city': 'San Francisco', 'state': 'CA', 'phone': '',
+          'genres': ['Jazz'], 'image_link': '', 'facebook_link': '', 'website_link': '',
+          'seeking_description': ''}
+
+# Every view with a @query_budget, as (method, url, form data, check(ids) on
+# the database afterwards, so a handler that failed early doesn't pass).
+ROUTES = [
+    ('GET', '/api/suggest?type=venue&q=Ven', None, None),
+    ('GET', '/venues', None, None),
+    ('POST', '/venues/search', {'search_term': 'Venue'}, None),
+    ('GET', '/venues/{venue}', None, None),
+    ('POST', '/venues/create', VENUE, lambda ids: Venue.query.filter_by(name='New Venue').count() == 1),
+    ('DELETE', '/venues/{venue}', None, lambda ids: Venue.query.get(ids['venue']) is None),
+    ('GET', '/artists', None, None),
+    ('POST', '/artists/search', {'search_term': 'Artist'}, None),
+    ('GET', '/artists/{artist}', None, None),
+    ('GET', '/artists/{artist}/edit', None, None),
+    ('POST', '/artists/{artist}/edit', dict(ARTIST, name='Renamed'),
+     lambda ids: Artist.query.get(ids['artist']).name == 'Renamed'),
+    ('GET', '/venues/{venue}/edit', None, None),
+    ('POST', '/venues/{venue}/edit', dict(VENUE, name='Renamed'),
+     lambda ids: Venue.query.get(ids['venue']).name == 'Renamed'),
+    ('POST', '/artists/create', ARTIST, lambda ids: Artist.query.filter_by(name='New Artist').count() == 1),
+    ('GET', '/shows', None, None),
+    ('POST', '/shows/create', {'venue_id': '{venue}', 'artist_id': '{artist}', 'start_time': '2040-01-01 20:00:00'},
+     lambda ids: Show.query.count() == 9),
+]
+
+
+@pytest.mark.parametrize('method, url, data, check', ROUTES, ids=['%s %s' % route[:2] for route in ROUTES])
+def test_route_stays_within_its_budget(app, client, seed, method, url, data, check):
+    # Under config_test a view over its budget raises QueryBudgetExceeded.
+    (venue_id, _), (artist_id, _) = seed(venues=2, artists=2, shows_per_venue=4)
+    ids = {'venue': venue_id, 'artist': artist_id}
+    if data is not None:
+        data = {key: value.format(**ids) if isinstance(value, str) else value for key, value in data.items()}
+    # Buffered, so a streamed body is sent and closed, which is when its
+    # budget is checked.
+    response = client.open(url.format(**ids), method=method, data=data, buffered=True)
+    assert response.status_code < 400
+    if check is not None:
+        with app.app_context():
+            assert check(ids)
+
+
+def test_over_budget_raises_when_testing(app):
+    view = query_budget(1)(lambda: [db.session.execute(text('SELECT 1')) for _ in range(2)])
+    with app.test_request_context('/'):
+        g.sqlstats = RequestStats()
+        with pytest.raises(QueryBudgetExceeded, match='over its budget of 1'):
+            view()
+
+
+def test_over_budget_only_logs_in_production(app, monkeypatch, caplog):
+    monkeypatch.setattr(fyyur.app, 'testing', False)
+    view = query_budget(1)(lambda: [db.session.execute(text('SELECT 1')) for _ in range(2)])
+    with app.test_request_context('/'), caplog.at_level(logging.WARNING, logger='fyyur.sql'):
+        g.sqlstats = RequestStats()
+        view()
+    assert 'over its budget of 1' in caplog.text
+
+
+def test_streamed_body_counts_against_the_budget(app):
+    def body():
+        for _ in range(2):
+            db.session.execute(text('SELECT 1'))
+            yield 'row'
+
+    view = query_budget(1)(lambda: Response(stream_with_context(body())))
+    with app.test_request_context('/'):
+        g.sqlstats = RequestStats()
+        response = view()
+        assert list(response.response) == ['row', 'row']
+        with pytest.raises(QueryBudgetExceeded, match='issued 2 statements'):
+            response.close()
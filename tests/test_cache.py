@@ -0,0 +1,35 @@
+from cache import LRUCache, PageCache
+
+
+def test_payload_is_cached():
+    cache = PageCache(LRUCache())
+    assert cache.get_or_set('venue:1', lambda: {'name': 'old'}) == {'name': 'old'}
+    assert cache.get_or_set('venue:1', lambda: {'name': 'new'}) == {'name': 'old'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_payload_invalidated_during_build_is_not_cached():
+    cache = PageCache(LRUCache())
+
+    def build():
+        # Another request commits a change to venue 1 and invalidates it
+        # while this one is still building from the old rows.
+        cache.invalidate('venue:1')
+        return {'name': 'old'}
+
+    assert cache.get_or_set('venue:1', build) == {'name': 'old'}
+    assert cache.get_or_set('venue:1', lambda: {'name': 'new'}) == {'name': 'new'}
+    assert cache.get_or_set('venue:1', lambda: {'name': 'newer'}) == {'name': 'new'}
+
+
+def test_missing_payload_is_not_cached():
+    cache = PageCache(LRUCache())
+    assert cache.get_or_set('venue:1', lambda: None) is None
+    assert cache.get_or_set('venue:1', lambda: {'name': 'new'}) == {'name': 'new'}
+
+
+def test_payload_stored_under_another_etag_is_rebuilt():
+    cache = PageCache(LRUCache())
+    cache.get_or_set('venue:1', lambda: {'name': 'old'}, 'etag-1')
+    assert cache.get_or_set('venue:1', lambda: {'name': 'new'}, 'etag-2') == {'name': 'new'}
+    assert cache.get_or_set('venue:1', lambda: {'name': 'newer'}, 'etag-2') == {'name': 'new'}
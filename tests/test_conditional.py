@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from models import db, Venue, VenueStats, Artist, ArtistStats, Show
+from timeutil import utcnow
+
+
+def test_venue_page_changed_elsewhere_is_not_served_from_cache(app, client, seed):
+    (venue_id,), _ = seed(venues=1, shows_per_venue=2)
+    assert b'Venue 0' in client.get('/venues/%d' % venue_id).data
+
+    # As another worker would: the row changes but this worker's page
+    # cache is not invalidated. (SQLite's now() has one-second resolution,
+    # so the new updated_at is set explicitly.)
+    with app.app_context():
+        db.session.execute(update(Venue).where(Venue.id == venue_id)
+                           .values(name='Renamed', updated_at=utcnow() + timedelta(seconds=1)))
+        db.session.commit()
+
+    response = client.get('/venues/%d' % venue_id)
+    assert b'Renamed' in response.data
+
+
+def test_deleting_a_venue_changes_the_listing_etag(app, client, seed):
+    (venue_id, _), _ = seed(venues=2, shows_per_venue=2)
+    etag = client.get('/venues').headers['ETag']
+
+    with app.app_context():
+        db.session.delete(Venue.query.get(venue_id))
+        db.session.commit()
+
+    response = client.get('/venues', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('url', ['/venues', '/shows', '/venues/{venue}', '/artists/{artist}'])
+def test_not_modified_costs_at_most_one_statement(seed, client, statements, url):
+    (venue_id,), (artist_id,) = seed(venues=1, shows_per_venue=2)
+    url = url.format(venue=venue_id, artist=artist_id)
+    etag = client.get(url).headers['ETag']
+
+    response, count = statements('GET', url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert count <= 1
+
+
+@pytest.mark.parametrize('url, deleted', [
+    ('/venues', Venue), ('/shows', Show), ('/venues/{venue}', Show), ('/artists/{artist}', Show)])
+def test_delete_moves_last_modified(app, client, seed, url, deleted):
+    (venue_id, _), (artist_id,) = seed(venues=2, shows_per_venue=2)
+    url = url.format(venue=venue_id, artist=artist_id)
+    # Everything last changed an hour ago, so the delete is in a later second.
+    with app.app_context():
+        for model in (Venue, Artist, Show, VenueStats, ArtistStats):
+            db.session.execute(update(model).values(updated_at=utcnow() - timedelta(hours=1)))
+        db.session.commit()
+    last_modified = client.get(url).headers['Last-Modified']
+    assert client.get(url, headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    with app.app_context():
+        db.session.delete(deleted.query.filter_by(**{'venue_id' if deleted is Show else 'id': venue_id}).first())
+        db.session.commit()
+
+    # Revalidating by date only, as a client without the ETag would.
+    response = client.get(url, headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert response.headers['Last-Modified'] != last_modified
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from conflicts import overlapping_shows
+from models import db, Show, MAX_SHOW_DURATION
+from timeutil import as_utc
+
+START = as_utc(datetime(2040, 1, 1, 20))
+
+
+@pytest.fixture
+def ids(app, seed):
+    (venue_id,), (artist_id,) = seed(venues=1)
+    return venue_id, artist_id
+
+
+def test_longest_show_still_overlaps(app, ids):
+    venue_id, artist_id = ids
+    with app.app_context():
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id,
+                            start_time=START, end_time=START + MAX_SHOW_DURATION))
+        db.session.commit()
+        last_hour = START + MAX_SHOW_DURATION - timedelta(hours=1)
+        assert len(overlapping_shows(venue_id, artist_id, last_hour, last_hour + timedelta(hours=2))) == 1
+        after = START + MAX_SHOW_DURATION
+        assert overlapping_shows(venue_id, artist_id, after, after + timedelta(hours=2)) == []
+
+
+def test_database_refuses_shows_longer_than_the_cap(app, ids):
+    venue_id, artist_id = ids
+    with app.app_context():
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id,
+                            start_time=START, end_time=START + MAX_SHOW_DURATION + timedelta(seconds=1)))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+
+
+def test_show_form_refuses_shows_longer_than_the_cap(app, client, ids):
+    venue_id, artist_id = ids
+    response = client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id,
+        'start_time': '2040-01-01 20:00:00', 'end_time': '2040-01-02 21:00:00'})
+    assert b'shows last at most 24 hours' in response.data
+    with app.app_context():
+        assert db.session.query(Show).count() == 0
+
+
+@pytest.mark.parametrize('end_time', ['2040-01-01 20:00:00', '2040-01-01 19:00:00'])
+def test_show_form_refuses_shows_ending_before_they_start(app, client, ids, end_time):
+    venue_id, artist_id = ids
+    response = client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id,
+        'start_time': '2040-01-01 20:00:00', 'end_time': end_time})
+    assert b'it must end after it starts' in response.data
+    with app.app_context():
+        assert db.session.query(Show).count() == 0
@@ -0,0 +1,124 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from importer import import_file
+from models import db, Show, Venue
+from timeutil import as_utc
+
+
+def write(path, lines):
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def show_line(venue_id, artist_id, start_time, end_time=None):
+    return json.dumps({'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time, 'end_time': end_time})
+
+
+def rejected(path):
+    with open(path + '.errors.ndjson') as report:
+        return {line['record']: line['errors'] for line in map(json.loads, report)}
+
+
+@pytest.fixture
+def ids(app, seed):
+    (venue_id,), (artist_id,) = seed(venues=1)
+    return venue_id, artist_id
+
+
+def test_row_refused_by_the_database_costs_only_itself(app, ids, tmp_path):
+    venue_id, artist_id = ids
+    lines = [show_line(venue_id, artist_id, '2040-01-%02d 20:00:00' % day) for day in range(1, 6)]
+    # Ends before it starts: passes the form, fails the CHECK constraint.
+    lines[2] = show_line(venue_id, artist_id, '2040-01-03 20:00:00', '2040-01-03 19:00:00')
+    path = write(tmp_path / 'shows.ndjson', lines)
+
+    with app.app_context():
+        summary = import_file('shows', path, batch_size=5)
+        assert summary['imported'] == 4
+        assert db.session.query(Show).count() == 4
+    assert list(rejected(path)) == [3]
+    with open(path + '.checkpoint') as checkpoint:
+        assert json.load(checkpoint)['position'] == 5
+
+
+def test_malformed_lines_are_rejected(app, ids, tmp_path):
+    venue_id, artist_id = ids
+    path = write(tmp_path / 'shows.ndjson', [
+        show_line(venue_id, artist_id, '2040-01-01 20:00:00'),
+        '{"venue_id": 1, "artist_id"',
+        '[1, 2]',
+        show_line(venue_id, artist_id, '2040-01-02 20:00:00'),
+    ])
+
+    with app.app_context():
+        summary = import_file('shows', path)
+    assert (summary['imported'], summary['rejected']) == (2, 2)
+    assert list(rejected(path)) == [2, 3]
+
+
+@pytest.mark.parametrize('start_time, expected', [
+    ('2040-01-01 20:00', '2040-01-01 20:00:00'),
+    ('2041-01-03T20:00:00+00:00', '2041-01-03 20:00:00'),
+    ('2041-01-03T22:00:00+02:00', '2041-01-03 20:00:00'),
+])
+def test_show_times_are_read_like_the_show_form(app, ids, tmp_path, start_time, expected):
+    venue_id, artist_id = ids
+    path = write(tmp_path / 'shows.ndjson', [show_line(venue_id, artist_id, start_time)])
+
+    with app.app_context():
+        assert import_file('shows', path)['imported'] == 1
+        show = db.session.query(Show).one()
+        assert as_utc(show.start_time).strftime('%Y-%m-%d %H:%M:%S') == expected
+
+
+def test_unreadable_show_time_is_rejected(app, ids, tmp_path):
+    venue_id, artist_id = ids
+    path = write(tmp_path / 'shows.ndjson', [show_line(venue_id, artist_id, 'next friday-ish')])
+
+    with app.app_context():
+        assert import_file('shows', path)['rejected'] == 1
+    assert 'start_time' in rejected(path)[1]
+
+
+def test_show_longer_than_the_cap_is_rejected(app, ids, tmp_path):
+    venue_id, artist_id = ids
+    path = write(tmp_path / 'shows.ndjson', [show_line(venue_id, artist_id, '2040-01-01 20:00:00', '2040-01-02 21:00:00')])
+
+    with app.app_context():
+        assert import_file('shows', path)['rejected'] == 1
+    assert 'end_time' in rejected(path)[1]
+
+
+def test_double_bookings_are_rejected(app, ids, tmp_path):
+    venue_id, artist_id = ids
+    with app.app_context():
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=as_utc(datetime(2040, 1, 1, 20)),
+                            end_time=as_utc(datetime(2040, 1, 2, 19))))
+        db.session.commit()
+    path = write(tmp_path / 'shows.ndjson', [
+        show_line(venue_id, artist_id, '2040-01-02 18:00:00'),  # overlaps the booked show
+        show_line(venue_id, artist_id, '2040-01-02 19:00:00'),
+        show_line(venue_id, artist_id, '2040-01-02 20:00:00'),  # overlaps the previous line
+        show_line(venue_id, artist_id, '2040-01-02 21:00:00'),
+    ])
+
+    with app.app_context():
+        summary = import_file('shows', path)
+        assert (summary['imported'], summary['rejected']) == (2, 2)
+    assert sorted(rejected(path)) == [1, 3]
+
+
+def test_empty_and_missing_text_are_stored_alike_on_every_path(app, tmp_path):
+    # PostgreSQL imports through COPY, SQLite through executemany and the ORM.
+    path = write(tmp_path / 'venues.ndjson', [json.dumps({
+        'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+        'phone': '1231231234', 'genres': ['Jazz'], 'website_link': '', 'seeking_description': ''})])
+
+    with app.app_context():
+        assert import_file('venues', path)['imported'] == 1
+        venue = db.session.query(Venue).one()
+        assert (venue.website_link, venue.seeking_description) == ('', '')
+        assert venue.facebook_link is None
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import event, text
+
+import app as fyyur
+import stats
+from models import db, Show
+from timeutil import utcnow
+
+pytestmark = pytest.mark.postgres
+
+# Large enough that the planner prefers the shows indexes of migration
+# 3c9d2e5a7b10 over scanning the table.
+SHOWS = 1000000
+VENUES = ARTISTS = 2000
+
+
+@pytest.fixture(scope='module')
+def seeded(pg_app):
+    with pg_app.app_context():
+        db.session.execute(text(
+            "INSERT INTO venues (name, city, state) "
+            "SELECT 'Venue ' || n, 'San Francisco', 'CA' FROM generate_series(1, :venues) AS n"), {'venues': VENUES})
+        db.session.execute(text(
+            "INSERT INTO artists (name, city, state) "
+            "SELECT 'Artist ' || n, 'San Francisco', 'CA' FROM generate_series(1, :artists) AS n"), {'artists': ARTISTS})
+        db.session.execute(text(
+            "INSERT INTO shows (venue_id, artist_id, start_time, end_time) "
+            "SELECT n % :venues + 1, n % :artists + 1, "
+            "       now() + (n - :shows / 2) * interval '1 minute', "
+            "       now() + (n - :shows / 2) * interval '1 minute' + interval '2 hours' "
+            "FROM generate_series(1, :shows) AS n"), {'venues': VENUES, 'artists': ARTISTS, 'shows': SHOWS})
+        db.session.commit()
+        db.session.execute(text('ANALYZE venues, artists, shows'))
+        db.session.commit()
+    return pg_app
+
+
+def plans(run):
+    """EXPLAIN output of every statement `run()` issues."""
+    issued = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        issued.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    explained = []
+    with db.engine.connect() as connection:
+        for statement, parameters in issued:
+            rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters)
+            explained.append('\n'.join(row[0] for row in rows))
+    return explained
+
+
+def shows_plans(run):
+    found = [plan for plan in plans(run) if ' on shows' in plan]
+    assert found
+    return found
+
+
+def test_venue_page_query_uses_venue_index(seeded):
+    with seeded.app_context():
+        for plan in shows_plans(lambda: fyyur.venue_payload(7)):
+            assert 'Seq Scan on shows' not in plan
+            assert 'ix_shows_venue_id_start_time' in plan
+
+
+def test_artist_page_query_uses_artist_index(seeded):
+    with seeded.app_context():
+        for plan in shows_plans(lambda: fyyur.artist_payload(7)):
+            assert 'Seq Scan on shows' not in plan
+            assert 'ix_shows_artist_id_start_time' in plan
+
+
+def test_show_counts_use_indexes(seeded):
+    with seeded.app_context():
+        for key in (Show.venue_id, Show.artist_id):
+            for plan in shows_plans(lambda: stats.compute(key, [7, 8], utcnow())):
+                assert 'Seq Scan on shows' not in plan
+                assert 'Index' in plan
@@ -0,0 +1,37 @@
+import gc
+import threading
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def counter():
+    counter = metrics.Counter('fyyur_test_total', 'Test counter.', ('label',))
+    yield counter
+    metrics._collectors.remove(counter.collect)
+
+
+def test_shards_of_finished_threads_are_folded_into_the_total(counter):
+    counter.inc('a')
+    for _ in range(20):
+        thread = threading.Thread(target=counter.inc, args=('a',))
+        thread.start()
+        thread.join()
+    del thread
+    gc.collect()
+
+    assert len(counter._shards) == 1
+    (name, kind, help, samples), = counter.collect()
+    assert samples == [('fyyur_test_total', {'label': 'a'}, 21)]
+
+
+def test_streamed_templates_are_timed(client, seed):
+    seed(venues=1, shows_per_venue=2)
+    response = client.get('/shows', buffered=True)
+    assert response.status_code == 200
+
+    samples = client.get('/metrics').get_data(as_text=True).splitlines()
+    assert any(sample.startswith('fyyur_template_render_seconds_count{template="pages/shows.html"} ')
+               for sample in samples)
@@ -0,0 +1,27 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import app as fyyur
+import config
+from profiles import instance_secret_key, problems
+
+
+def test_non_integer_settings_are_reported_with_the_other_problems(monkeypatch):
+    monkeypatch.setenv('FYYUR_DB_POOL_SIZE', 'ten')
+    monkeypatch.setenv('FYYUR_DB_MAX_OVERFLOW', '-')
+    settings = dict(fyyur.app.config, SECRET_KEY='',
+                    DB_POOL_SIZE=config.env_int('DB_POOL_SIZE', 5),
+                    DB_MAX_OVERFLOW=config.env_int('DB_MAX_OVERFLOW', 10))
+
+    found = problems(settings, 'test')
+    assert 'DB_POOL_SIZE must be a whole number of at least 1' in found
+    assert 'DB_MAX_OVERFLOW must be a whole number' in found
+    assert any(problem.startswith('SECRET_KEY') for problem in found)
+
+
+def test_workers_starting_together_share_one_secret_key(tmp_path):
+    with ThreadPoolExecutor(8) as pool:
+        keys = set(pool.map(lambda _: instance_secret_key(str(tmp_path)), range(32)))
+    assert len(keys) == 1
+    assert len(keys.pop()) == 64
+    assert os.listdir(str(tmp_path)) == ['secret_key']
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+import app as fyyur
+from cache import create_cache
+from models import db, Venue
+from timeutil import utcnow
+
+
+@pytest.fixture
+def replicated(monkeypatch, tmp_path):
+    """replicated(replica_uri=None) points the app at a primary SQLite file
+    and one replica, by default another SQLite file; each file holds venue 1,
+    named after the database it is in. Returns a test client."""
+    engines = []
+
+    def replicated(replica_uri=None):
+        primary_uri = 'sqlite:///%s' % (tmp_path / 'primary.db')
+        seed_replica = replica_uri is None
+        replica_uri = replica_uri or 'sqlite:///%s' % (tmp_path / 'replica.db')
+        monkeypatch.setattr(fyyur, 'page_cache', create_cache(fyyur.app.config))
+        monkeypatch.setitem(fyyur.app.config, 'SQLALCHEMY_DATABASE_URI', primary_uri)
+        monkeypatch.setitem(fyyur.app.config, 'SQLALCHEMY_REPLICA_URIS', [replica_uri])
+        monkeypatch.delitem(fyyur.app.extensions, 'replicas', raising=False)
+        with fyyur.app.app_context():
+            sources = [(db.engine, 'Primary')]
+            if seed_replica:
+                sources.append((create_engine(replica_uri), 'Replica'))
+                engines.append(sources[-1][0])
+            for index, (engine, name) in enumerate(sources):
+                db.metadata.create_all(engine)
+                with engine.begin() as connection:
+                    # Different updated_at, so each copy has its own ETag.
+                    connection.execute(Venue.__table__.insert(), {
+                        'id': 1, 'name': '%s Venue' % name, 'city': 'San Francisco', 'state': 'CA',
+                        'address': '1 Main St', 'updated_at': utcnow() - timedelta(days=index)})
+        return fyyur.app.test_client()
+
+    yield replicated
+    with fyyur.app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    for engine in engines:
+        engine.dispose()
+    replicas = fyyur.app.extensions.pop('replicas', None)
+    for replica in replicas.replicas if replicas else ():
+        replica.engine.dispose()
+
+
+def test_reads_go_to_the_replica(replicated):
+    client = replicated()
+    assert b'Replica Venue' in client.get('/venues/1').data
+
+
+def test_reads_after_a_write_go_to_the_primary(replicated):
+    client = replicated()
+    client.post('/venues/search', data={'search_term': 'Venue'})
+    assert b'Primary Venue' in client.get('/venues/1').data
+
+
+def test_reads_fall_back_to_the_primary_when_the_replica_is_down(replicated, tmp_path):
+    client = replicated('sqlite:///%s' % (tmp_path / 'missing' / 'replica.db'))
+    response = client.get('/venues/1')
+    assert response.status_code == 200
+    assert b'Primary Venue' in response.data
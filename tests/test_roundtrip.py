@@ -0,0 +1,44 @@
+import csv
+import io
+
+from exporter import export
+from importer import import_file
+from models import db, Venue, Artist, Show
+from timeutil import utcnow
+
+KINDS = ('venues', 'artists', 'shows')
+
+
+def exported(kind):
+    # The CSV export, without the columns the database fills in.
+    rows = list(csv.DictReader(io.StringIO(b''.join(export(kind, fmt='csv')).decode('utf-8'))))
+    for row in rows:
+        row.pop('updated_at')
+    return rows
+
+
+def test_csv_export_imports_back(app, tmp_path):
+    with app.app_context():
+        db.session.add_all([
+            Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+                  phone='1231231234', genres=['Jazz', 'Folk'], seeking_talent=True),
+            Venue(name='Park Square', city='San Francisco', state='CA', address='34 Whiskey Moore Ave',
+                  phone='4158292323', genres=['Classical'], seeking_talent=False, facebook_link='https://www.facebook.com/ParkSquare'),
+            Artist(name='Guns N Petals', city='San Francisco', state='CA', phone='3261235000', genres=['RocknRoll'],
+                   seeking_venue=True, seeking_description='Looking for shows in the Bay Area'),
+        ])
+        db.session.flush()
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=utcnow().replace(microsecond=0)))
+        db.session.commit()
+        before = {kind: exported(kind) for kind in KINDS}
+
+        for kind in KINDS:
+            (tmp_path / (kind + '.csv')).write_bytes(b''.join(export(kind, fmt='csv')))
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        for kind in KINDS:
+            summary = import_file(kind, str(tmp_path / (kind + '.csv')))
+            assert (summary['imported'], summary['rejected']) == (len(before[kind]), 0)
+
+        assert {kind: exported(kind) for kind in KINDS} == before
@@ -0,0 +1,42 @@
+import pytest
+
+from models import db, Venue
+
+
+@pytest.fixture
+def venues(app):
+    with app.app_context():
+        db.session.add_all([
+            Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']),
+            Venue(name='The Dueling Pianos Bar', city='New York', state='NY', genres=['Classical']),
+            Venue(name='Park Square Live Music & Coffee', city='San Francisco', state='CA', genres=['Folk']),
+        ])
+        db.session.commit()
+
+
+def found(client, url, term):
+    response = client.post(url, data={'search_term': term})
+    assert response.status_code == 200
+    return response.data
+
+
+@pytest.mark.parametrize('term, expected, missing', [
+    ('hop', [b'The Musical Hop'], [b'Dueling', b'Park Square']),
+    ('music', [b'The Musical Hop', b'Park Square'], [b'Dueling']),
+    ('york', [b'Dueling'], [b'Musical Hop']),
+    ('ny', [b'Dueling'], [b'Musical Hop']),
+    ('classic', [b'Dueling'], [b'Musical Hop', b'Park Square']),
+])
+def test_venue_search_matches_name_city_state_and_genre(client, venues, term, expected, missing):
+    data = found(client, '/venues/search', term)
+    for name in expected:
+        assert name in data
+    for name in missing:
+        assert name not in data
+
+
+def test_search_is_capped_at_search_limit(client, seed, monkeypatch, app):
+    seed(venues=8)
+    monkeypatch.setitem(app.config, 'SEARCH_LIMIT', 5)
+    data = found(client, '/venues/search', 'venue')
+    assert data.count(b'href="/venues/') == 5
@@ -0,0 +1,18 @@
+def test_venues_page_lists_every_venue(client, seed):
+    seed(venues=3, shows_per_venue=2)
+    response = client.get('/venues')
+    assert response.status_code == 200
+    for name in (b'Venue 0', b'Venue 1', b'Venue 2'):
+        assert name in response.data
+
+
+def test_venues_statements_do_not_grow_with_venues(seed, statements):
+    seed(venues=3, shows_per_venue=2)
+    response, few = statements('GET', '/venues')
+    assert response.status_code == 200
+
+    seed(venues=37, shows_per_venue=2)
+    response, many = statements('GET', '/venues')
+    assert response.status_code == 200
+    assert b'Venue 36' in response.data
+    assert many == few
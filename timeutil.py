@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value):
+    # Times are stored in UTC; SQLite hands them back naive, PostgreSQL as
+    # timestamptz in the session's zone. Either way, return aware UTC.
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)